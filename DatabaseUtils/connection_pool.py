@@ -0,0 +1,117 @@
+import sqlite3
+import os
+import threading
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of SQLite connections shared by all DatabaseUtils handlers.
+
+    A handler checks a connection out when it is created and hands it back in close(),
+    so a connection is only ever used by one thread at a time while still being reused
+    across the short-lived threads pywebview runs API calls on. The schema setup of a
+    database (CREATE TABLE / migrations) runs only once per process instead of once
+    per handler instance.
+    """
+    MAX_IDLE_PER_DB = 8
+
+    # Applied to every connection of a database opened in WAL storage mode
+    WAL_PRAGMAS = [
+        "PRAGMA journal_mode = WAL",     # readers no longer block on the writer (persistent per file)
+        "PRAGMA synchronous = NORMAL",   # safe with WAL, avoids an fsync on every commit
+        "PRAGMA cache_size = -16000",    # ~16 MB page cache per connection
+        "PRAGMA mmap_size = 134217728",  # 128 MB memory-mapped reads
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA busy_timeout = 5000",    # wait instead of failing with 'database is locked'
+    ]
+
+    _lock = threading.Lock()
+    _idle = {}  # {db_path: [connection, ...]}
+    _initialized = set()  # db paths whose schema has already been set up in this process
+
+    @staticmethod
+    def _normalize(db_name):
+        if db_name == ":memory:":
+            return db_name
+        return os.path.abspath(db_name)
+
+    @staticmethod
+    def apply_pragmas(conn):
+        for pragma in ConnectionPool.WAL_PRAGMAS:
+            conn.execute(pragma)
+
+    @classmethod
+    def acquire(cls, db_name, row_factory=None, wal=False):
+        """
+        Returns an idle connection to `db_name`, or opens a new one if none is available.
+        New connections get WAL_PRAGMAS when `wal` is set.
+        """
+        db_path = cls._normalize(db_name)
+        conn = None
+        if db_path != ":memory:":
+            with cls._lock:
+                idle = cls._idle.get(db_path)
+                if idle:
+                    conn = idle.pop()
+        if conn is None:
+            # check_same_thread=False because pooled connections move between threads;
+            # the pool guarantees a connection is never checked out twice at once.
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            if wal:
+                cls.apply_pragmas(conn)
+        conn.row_factory = row_factory
+        return conn
+
+    @classmethod
+    def release(cls, db_name, conn):
+        """Hands a connection back to the pool, discarding any uncommitted work like close() used to."""
+        db_path = cls._normalize(db_name)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            print(f"Error rolling back pooled connection for {db_path}: {e}")
+            conn.close()
+            return
+
+        if db_path == ":memory:":
+            # In-memory databases are private to their connection, nothing to share
+            conn.close()
+            return
+        with cls._lock:
+            idle = cls._idle.setdefault(db_path, [])
+            if len(idle) < cls.MAX_IDLE_PER_DB:
+                idle.append(conn)
+                return
+        conn.close()
+
+    @classmethod
+    def ensure_schema(cls, db_name, init_fn):
+        """
+        Runs `init_fn()` once per process for `db_name`.
+        In-memory databases are private to their connection, so they are always initialized.
+        """
+        db_path = cls._normalize(db_name)
+        if db_path == ":memory:":
+            init_fn()
+            return
+        if db_path in cls._initialized:
+            return
+        with cls._lock:
+            if db_path in cls._initialized:
+                return
+            init_fn()
+            cls._initialized.add(db_path)
+
+    @classmethod
+    def close_all(cls):
+        """Closes every idle connection and forgets schema state (e.g. on shutdown or after dropping tables)."""
+        with cls._lock:
+            for connections in cls._idle.values():
+                for conn in connections:
+                    try:
+                        conn.close()
+                    except sqlite3.Error as e:
+                        print(f"Error closing pooled connection: {e}")
+            cls._idle = {}
+            cls._initialized = set()
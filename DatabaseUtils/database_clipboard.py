@@ -2,6 +2,8 @@ import sqlite3
 import os
 import sys
 from datetime import datetime
+from DatabaseUtils.connection_pool import ConnectionPool
+from DatabaseUtils.fts import build_match_query, search_terms, like_pattern, make_snippet
 
 class ClipboardMessagesDatabaseHandler:
     def __init__(self, db_name=None):
@@ -25,11 +27,11 @@ class ClipboardMessagesDatabaseHandler:
         self.conn = None
         self.cursor = None
         self._connect()
-        self._create_table()
+        ConnectionPool.ensure_schema(self.db_name, self._create_table)
 
     def _connect(self):
-        self.conn = sqlite3.connect(self.db_name)
-        self.conn.row_factory = sqlite3.Row # Access columns by name
+        # Connections come from the shared pool, so creating a handler is cheap
+        self.conn = ConnectionPool.acquire(self.db_name, row_factory=sqlite3.Row) # Access columns by name
         self.cursor = self.conn.cursor()
 
     def _create_table(self):
@@ -41,9 +43,38 @@ class ClipboardMessagesDatabaseHandler:
                     timestamp TEXT NOT NULL
                 )
             """)
+            # Backs the newest-first keyset pagination in get_messages_page
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_clipboard_messages_timestamp ON clipboard_messages (timestamp, id)")
+            # Single change counter, read by Api to tell whether cached clips are still current
+            self.cursor.execute("CREATE TABLE IF NOT EXISTS change_versions (scope TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                self.cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS clipboard_version_{event.lower()} AFTER {event} ON clipboard_messages BEGIN
+                    INSERT INTO change_versions (scope, version) VALUES ('all', 1)
+                    ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+                END""")
             self.conn.commit()
         except sqlite3.Error as e:
             print(f"Error creating clipboard_messages table: {e}")
+        self._create_fts()
+
+    def _create_fts(self):
+        """Full-text index over clip contents (rowid = clipboard_messages.id), kept in sync by triggers."""
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clipboard_fts'")
+            if self.cursor.fetchone():
+                return
+            self.cursor.execute("CREATE VIRTUAL TABLE clipboard_fts USING fts5 (content, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+            self.cursor.execute("""CREATE TRIGGER IF NOT EXISTS clipboard_fts_insert AFTER INSERT ON clipboard_messages BEGIN
+                INSERT INTO clipboard_fts (rowid, content) VALUES (new.id, new.content);
+            END""")
+            self.cursor.execute("""CREATE TRIGGER IF NOT EXISTS clipboard_fts_delete AFTER DELETE ON clipboard_messages BEGIN
+                DELETE FROM clipboard_fts WHERE rowid = old.id;
+            END""")
+            self.cursor.execute("INSERT INTO clipboard_fts (rowid, content) SELECT id, content FROM clipboard_messages")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error creating clipboard_fts index: {e}")
+            self.conn.rollback()
 
     def add_message(self, content, timestamp):
         try:
@@ -75,6 +106,80 @@ class ClipboardMessagesDatabaseHandler:
             print(f"Error getting all clipboard messages: {e}")
             return []
             
+    def get_messages_page(self, limit=50, before_timestamp=None, before_id=None):
+        """
+        Keyset-paginated clipboard messages, newest first (ORDER BY timestamp DESC, id DESC).
+        Returns up to `limit` rows strictly older than the (before_timestamp, before_id) cursor.
+        """
+        try:
+            params = []
+            where_clause = ""
+            if before_timestamp is not None:
+                if before_id is not None:
+                    where_clause = "WHERE (timestamp, id) < (?, ?)"
+                    params.extend([before_timestamp, int(before_id)])
+                else:
+                    where_clause = "WHERE timestamp < ?"
+                    params.append(before_timestamp)
+            self.cursor.execute(f"SELECT id, content, timestamp FROM clipboard_messages {where_clause} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                                params + [int(limit)])
+            return [dict(row) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error getting clipboard messages page: {e}")
+            return []
+
+    def search_messages(self, text, limit=50, match_any=False):
+        """Full-text search over clip contents, best matches first (BM25), with `score` and `snippet`."""
+        match_query = build_match_query(text, prefix_last=not match_any, match_any=match_any)
+        if match_query is None:
+            return []
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clipboard_fts'")
+            if self.cursor.fetchone() is None:
+                return self._search_messages_like(text, limit, match_any)
+            self.cursor.execute("""
+                SELECT c.id, c.content, c.timestamp,
+                       bm25(clipboard_fts) AS rank,
+                       snippet(clipboard_fts, 0, '[', ']', '…', 12) AS snippet
+                FROM clipboard_fts
+                JOIN clipboard_messages c ON c.id = clipboard_fts.rowid
+                WHERE clipboard_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (match_query, int(limit)))
+            return [{"id": row["id"], "content": row["content"], "timestamp": row["timestamp"],
+                     "score": -row["rank"], "snippet": row["snippet"]} for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error searching clipboard messages: {e}")
+            return []
+
+    def _search_messages_like(self, text, limit=50, match_any=False):
+        """search_messages without FTS5: LIKE matching, `score` is the number of distinct words matched."""
+        terms = list(dict.fromkeys(search_terms(text)))
+        patterns = [like_pattern(term) for term in terms]
+        condition = "content LIKE ? ESCAPE '\\'"
+        score = " + ".join(f"CASE WHEN {condition} THEN 1 ELSE 0 END" for _ in terms)
+        where_clause = (" OR " if match_any else " AND ").join(condition for _ in terms)
+        self.cursor.execute(f"""
+            SELECT id, content, timestamp, {score} AS score
+            FROM clipboard_messages
+            WHERE {where_clause}
+            ORDER BY score DESC, timestamp DESC, id DESC
+            LIMIT ?
+        """, patterns + patterns + [int(limit)])
+        return [{"id": row["id"], "content": row["content"], "timestamp": row["timestamp"],
+                 "score": float(row["score"]), "snippet": make_snippet(row["content"], terms)} for row in self.cursor.fetchall()]
+
+    def get_change_version(self):
+        """Returns the counter bumped on every insert, update or delete of a clip."""
+        try:
+            self.cursor.execute("SELECT version FROM change_versions WHERE scope = 'all'")
+            row = self.cursor.fetchone()
+            return row["version"] if row else 0
+        except sqlite3.Error as e:
+            print(f"Error getting clipboard change version: {e}")
+            return None
+
     def get_message_count(self):
         try:
             self.cursor.execute("SELECT COUNT(*) FROM clipboard_messages")
@@ -95,8 +200,12 @@ class ClipboardMessagesDatabaseHandler:
             return False
 
     def close(self):
+        # The connection goes back to the pool instead of being closed
         if self.conn:
-            self.conn.close()
+            self.cursor.close()
+            ConnectionPool.release(self.db_name, self.conn)
+            self.conn = None
+            self.cursor = None
 
 if __name__ == '__main__':
     # Example Usage
@@ -1,8 +1,144 @@
 import sqlite3
 import os
 import sys # Import sys
+import json
+import uuid
+from datetime import datetime
+from DatabaseUtils.connection_pool import ConnectionPool
+from DatabaseUtils.database_writer import DatabaseWriter
+from DatabaseUtils.fts import build_match_query, search_terms, like_pattern, make_snippet
+
+# Versioned secondary and full-text indexes, applied in order and tracked with PRAGMA user_version.
+# Append a new (version, statements) entry to add indexes; never edit an applied one.
+# A failing migration stops the chain, except the optional ones below.
+INDEX_MIGRATIONS = [
+    (1, [
+        # get_project_messages(project_name=...) and per-project views ordered by time
+        "CREATE INDEX IF NOT EXISTS idx_messages_project_timestamp ON messages (project, timestamp)",
+        # ORDER BY timestamp (main chat, image descriptions)
+        "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp, id)",
+        # get_project_messages(only_unprocessed=True)
+        "CREATE INDEX IF NOT EXISTS idx_messages_unprocessed ON messages (project) WHERE processed = 0",
+        # get_reminder_messages (matches its WHERE and ORDER BY exactly)
+        "CREATE INDEX IF NOT EXISTS idx_messages_reminders ON messages (done, remind) WHERE remind IS NOT NULL AND remind != ''",
+        # active (not done) reminders only
+        "CREATE INDEX IF NOT EXISTS idx_messages_active_reminders ON messages (remind) WHERE remind IS NOT NULL AND done = 0",
+        # get_message_images and the bulk image fetch
+        "CREATE INDEX IF NOT EXISTS idx_message_images_message_id ON message_images (message_id)",
+        # process_unprocessed_images scan for images without a description
+        "CREATE INDEX IF NOT EXISTS idx_message_images_undescribed ON message_images (message_id) WHERE description IS NULL OR description = ''",
+    ]),
+    (2, [
+        # Full-text index over message text and the descriptions of its images (rowid = messages.id),
+        # kept in sync by triggers and used by search_messages
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (content, image_descriptions, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content, image_descriptions) VALUES (new.id, new.content, '');
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            UPDATE messages_fts SET content = new.content WHERE rowid = new.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            DELETE FROM messages_fts WHERE rowid = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS message_images_fts_insert AFTER INSERT ON message_images BEGIN
+            UPDATE messages_fts SET image_descriptions = COALESCE((SELECT group_concat(description, ' ') FROM message_images WHERE message_id = new.message_id), '')
+            WHERE rowid = new.message_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS message_images_fts_update AFTER UPDATE OF description ON message_images BEGIN
+            UPDATE messages_fts SET image_descriptions = COALESCE((SELECT group_concat(description, ' ') FROM message_images WHERE message_id = new.message_id), '')
+            WHERE rowid = new.message_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS message_images_fts_delete AFTER DELETE ON message_images BEGIN
+            UPDATE messages_fts SET image_descriptions = COALESCE((SELECT group_concat(description, ' ') FROM message_images WHERE message_id = old.message_id), '')
+            WHERE rowid = old.message_id;
+        END""",
+        # Backfill existing rows
+        "DELETE FROM messages_fts",
+        """INSERT INTO messages_fts (rowid, content, image_descriptions)
+            SELECT m.id, m.content, COALESCE((SELECT group_concat(description, ' ') FROM message_images WHERE message_id = m.id), '')
+            FROM messages m""",
+    ]),
+    (3, [
+        # Change counters read by Api to tell whether a cached context is still current.
+        # Scope 'all' changes on every write; 'project:<name>' ('project:' for messages without
+        # a project) only when that project's messages or their images change.
+        "CREATE TABLE IF NOT EXISTS change_versions (scope TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+        """CREATE TRIGGER IF NOT EXISTS messages_version_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO change_versions (scope, version) VALUES ('all', 1), ('project:' || COALESCE(new.project, ''), 1)
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_version_update AFTER UPDATE ON messages BEGIN
+            INSERT INTO change_versions (scope, version)
+            VALUES ('all', 1), ('project:' || COALESCE(old.project, ''), 1), ('project:' || COALESCE(new.project, ''), 1)
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS messages_version_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO change_versions (scope, version) VALUES ('all', 1), ('project:' || COALESCE(old.project, ''), 1)
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS message_images_version_insert AFTER INSERT ON message_images BEGIN
+            INSERT INTO change_versions (scope, version)
+            SELECT 'all', 1 UNION ALL SELECT 'project:' || COALESCE(project, ''), 1 FROM messages WHERE id = new.message_id
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS message_images_version_update AFTER UPDATE ON message_images BEGIN
+            INSERT INTO change_versions (scope, version)
+            SELECT 'all', 1 UNION ALL SELECT 'project:' || COALESCE(project, ''), 1 FROM messages WHERE id = new.message_id
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS message_images_version_delete AFTER DELETE ON message_images BEGIN
+            INSERT INTO change_versions (scope, version)
+            SELECT 'all', 1 UNION ALL SELECT 'project:' || COALESCE(project, ''), 1 FROM messages WHERE id = old.message_id
+            ON CONFLICT (scope) DO UPDATE SET version = version + 1;
+        END""",
+    ]),
+    (4, [
+        # Journal of message-processing runs (ModelClient.process_all_main_chat_messages): which
+        # messages each batch holds, the raw model response once received and whether it was
+        # applied, so an interrupted run resumes without asking the model again.
+        """CREATE TABLE IF NOT EXISTS processing_runs (
+            run_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'running',
+            started_at TEXT NOT NULL,
+            finished_at TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS processing_batches (
+            run_id TEXT NOT NULL,
+            batch_index INTEGER NOT NULL,
+            message_ids TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            response TEXT,
+            error TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (run_id, batch_index),
+            FOREIGN KEY (run_id) REFERENCES processing_runs (run_id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_processing_runs_status ON processing_runs (status, started_at)",
+    ]),
+    (5, [
+        # The image worker keysets on the image id (get_undescribed_images / count_undescribed_images),
+        # so the undescribed-images index has to be on id to serve `id > ? ORDER BY id`
+        "DROP INDEX IF EXISTS idx_message_images_undescribed",
+        "CREATE INDEX IF NOT EXISTS idx_message_images_undescribed_id ON message_images (id) WHERE description IS NULL OR description = ''",
+    ]),
+    (6, [
+        # get_described_images reads only the described images instead of walking every message by timestamp
+        "CREATE INDEX IF NOT EXISTS idx_message_images_described ON message_images (message_id) WHERE description IS NOT NULL AND description != ''",
+    ]),
+]
+
+# Migrations the database works without, as {version: table it creates}: v2 needs SQLite's
+# FTS5 extension, without it search_messages falls back to LIKE matching. When one fails the
+# later migrations still apply, and it is retried whenever the schema is checked.
+OPTIONAL_MIGRATIONS = {2: "messages_fts"}
 
 class MessageDatabaseHandler:
+    # WAL storage mode: tuned PRAGMAs on every connection and all writes funneled through
+    # one DatabaseWriter thread with batched commits. Set to False for the legacy
+    # rollback-journal mode where each handler commits its own statements.
+    USE_WAL_WRITER = True
+
     def __init__(self, db_name=None):
         if db_name is None:
             # Determine base path for data files
@@ -35,12 +171,27 @@ class MessageDatabaseHandler:
         self.conn = None
         self.cursor = None
         self._connect()
-        self._create_table()
+        ConnectionPool.ensure_schema(self.db_name, self._create_table)
+
+        # An in-memory database is private to its connection, so a separate writer can't see it
+        if self.USE_WAL_WRITER and self.db_name != ":memory:":
+            self._writer = DatabaseWriter.for_db(self.db_name)
+        else:
+            self._writer = None
 
     def _connect(self):
-        self.conn = sqlite3.connect(self.db_name)
+        # Connections come from the shared pool, so creating a handler is cheap
+        self.conn = ConnectionPool.acquire(self.db_name, wal=self.USE_WAL_WRITER)
         self.cursor = self.conn.cursor()
 
+    def _write(self, work):
+        """Runs `work(cursor)` as a committed write and returns its result."""
+        if self._writer is not None:
+            return self._writer.submit(work)
+        result = work(self.cursor)
+        self.conn.commit()
+        return result
+
     def _create_table(self):
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS messages (
@@ -72,21 +223,108 @@ class MessageDatabaseHandler:
         """)
         self.conn.commit()
 
-    def add_message(self, message):
-        self.cursor.execute("INSERT INTO messages (content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (message['content'], message['timestamp'], message['project'], message['files'], message['extra'], message['processed'], message['remind'], message['importance'], message.get('reoccurences', None), message.get('done', 0)))
-        self.conn.commit()
+        self._migrate_indexes()
+
+    def _migrate_indexes(self):
+        """Creates any secondary indexes from INDEX_MIGRATIONS newer than the database's user_version."""
+        self.cursor.execute("PRAGMA user_version")
+        current_version = self.cursor.fetchone()[0]
+        for version, statements in INDEX_MIGRATIONS:
+            if version <= current_version:
+                # An optional migration skipped earlier (e.g. SQLite has since gained FTS5)
+                if version in OPTIONAL_MIGRATIONS and not self._has_table(OPTIONAL_MIGRATIONS[version]):
+                    self._apply_migration(version, statements, set_version=False)
+                continue
+            if not self._apply_migration(version, statements) and version not in OPTIONAL_MIGRATIONS:
+                break
+
+    def _apply_migration(self, version, statements, set_version=True):
+        try:
+            for statement in statements:
+                self.cursor.execute(statement)
+            if set_version:
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+            self.conn.commit()
+            print(f"Applied messages index migration v{version}.")
+            return True
+        except sqlite3.Error as e:
+            print(f"Failed to apply messages index migration v{version}: {e}")
+            self.conn.rollback()
+            if set_version and version in OPTIONAL_MIGRATIONS:
+                # Skipped, the later migrations must not wait for it
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+                self.conn.commit()
+            return False
+
+    def _has_table(self, name):
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+        return self.cursor.fetchone() is not None
 
-        # Get the last inserted ID
-        self.cursor.execute("SELECT last_insert_rowid()")
-        last_id = self.cursor.fetchone()[0]
-        return last_id
+    def add_message(self, message):
+        def insert(cursor):
+            cursor.execute("INSERT INTO messages (content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (message['content'], message['timestamp'], message['project'], message['files'], message['extra'], message['processed'], message['remind'], message['importance'], message.get('reoccurences', None), message.get('done', 0)))
+            # Get the last inserted ID
+            return cursor.lastrowid
+        return self._write(insert)
 
     def add_message_image(self, message_id, file_path, created_at):
-        self.cursor.execute("INSERT INTO message_images (message_id, file_path, created_at) VALUES (?, ?, ?)",
-                            (message_id, file_path, created_at))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        def insert(cursor):
+            cursor.execute("INSERT INTO message_images (message_id, file_path, created_at) VALUES (?, ?, ?)",
+                           (message_id, file_path, created_at))
+            return cursor.lastrowid
+        return self._write(insert)
+
+    def update_image_descriptions(self, descriptions):
+        """Sets the description of several images in one write. `descriptions` maps image id -> description."""
+        if not descriptions:
+            return 0
+        rows = [(description, img_id) for img_id, description in descriptions.items()]
+        return self._write(lambda cursor: cursor.executemany("UPDATE message_images SET description = ? WHERE id = ?", rows).rowcount)
+
+    def get_undescribed_images(self, limit=None, after_id=0):
+        """
+        Returns the images without a description, oldest first, with the content of their message.
+        `after_id` and `limit` read them in slices (keyset on the image id).
+        """
+        sql = """
+            SELECT mi.id, mi.message_id, mi.file_path, m.content
+            FROM message_images mi
+            JOIN messages m ON mi.message_id = m.id
+            WHERE (mi.description IS NULL OR mi.description = '') AND mi.id > ?
+            ORDER BY mi.id
+        """
+        params = (int(after_id),)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        self.cursor.execute(sql, params)
+        return [{"id": row[0], "message_id": row[1], "file_path": row[2], "content": row[3]} for row in self.cursor.fetchall()]
+
+    def count_undescribed_images(self, after_id=0):
+        """Number of images without a description (with an id above `after_id`)."""
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM message_images mi
+            JOIN messages m ON mi.message_id = m.id
+            WHERE (mi.description IS NULL OR mi.description = '') AND mi.id > ?
+        """, (int(after_id),))
+        return self.cursor.fetchone()[0]
+
+    def get_described_images(self):
+        """Returns the images that have a description, newest message first, with the content of their message."""
+        self.cursor.execute("""
+            SELECT mi.id, mi.message_id, mi.file_path, mi.description, m.content
+            FROM message_images mi
+            JOIN messages m ON mi.message_id = m.id
+            WHERE mi.description IS NOT NULL AND mi.description != ''
+            ORDER BY m.timestamp DESC
+        """)
+        return [{"id": row[0], "message_id": row[1], "file_path": row[2], "description": row[3], "content": row[4]}
+                for row in self.cursor.fetchall()]
+
+    def clear_image_descriptions(self):
+        """Clears every image description so the images get reprocessed. Returns the number of rows touched."""
+        return self._write(lambda cursor: cursor.execute("UPDATE message_images SET description = NULL").rowcount)
 
     def get_message_images(self, message_id):
         self.cursor.execute("SELECT id, file_path, description, created_at FROM message_images WHERE message_id = ?", (message_id,))
@@ -173,25 +411,161 @@ class MessageDatabaseHandler:
         values.append(task_id)
 
         # Execute the update
-        self.cursor.execute(sql, values)
-        self.conn.commit()
+        self._write(lambda cursor: cursor.execute(sql, values).rowcount)
+
+    def update_processed_messages(self, updates, run_id=None, batch_index=None):
+        """
+        Marks several messages processed in one transaction, applying what the model assigned.
+
+        `updates` is a list of dicts with `id` and optionally `project`, `remind`, `importance`
+        and `reoccurences`; like update_message, a missing (None) field keeps its current value.
+        With `run_id`/`batch_index`, that journaled batch is marked applied in the same transaction.
+        Returns the number of rows updated.
+        """
+        rows = [(update.get('project'), update.get('remind'), update.get('importance'), update.get('reoccurences'), update['id'])
+                for update in updates]
+        if not rows and run_id is None:
+            return 0
+
+        def apply(cursor):
+            updated = 0
+            if rows:
+                updated = cursor.executemany("""
+                    UPDATE messages SET processed = 1,
+                        project = COALESCE(?, project),
+                        remind = COALESCE(?, remind),
+                        importance = COALESCE(?, importance),
+                        reoccurences = COALESCE(?, reoccurences)
+                    WHERE id = ?
+                """, rows).rowcount
+            if run_id is not None:
+                cursor.execute("UPDATE processing_batches SET status = 'applied', error = NULL, updated_at = ? WHERE run_id = ? AND batch_index = ?",
+                               (datetime.now().isoformat(), run_id, batch_index))
+            return updated
+        return self._write(apply)
+
+    def start_processing_run(self, batches):
+        """Journals a new processing run. `batches` is a list of message id lists. Returns the run id."""
+        run_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+
+        def insert(cursor):
+            cursor.execute("INSERT INTO processing_runs (run_id, status, started_at) VALUES (?, 'running', ?)", (run_id, now))
+            cursor.executemany("INSERT INTO processing_batches (run_id, batch_index, message_ids, updated_at) VALUES (?, ?, ?, ?)",
+                               [(run_id, idx, json.dumps(ids), now) for idx, ids in enumerate(batches)])
+        self._write(insert)
+        return run_id
+
+    def add_processing_batches(self, run_id, batches):
+        """Appends batches to a journaled run. Returns their batch indexes."""
+        now = datetime.now().isoformat()
+
+        def insert(cursor):
+            cursor.execute("SELECT COALESCE(MAX(batch_index) + 1, 0) FROM processing_batches WHERE run_id = ?", (run_id,))
+            first_index = cursor.fetchone()[0]
+            cursor.executemany("INSERT INTO processing_batches (run_id, batch_index, message_ids, updated_at) VALUES (?, ?, ?, ?)",
+                               [(run_id, first_index + i, json.dumps(ids), now) for i, ids in enumerate(batches)])
+            return list(range(first_index, first_index + len(batches)))
+        return self._write(insert)
+
+    def get_unfinished_processing_run(self):
+        """
+        Returns the latest run that never finished (crashed or cancelled) as
+        {'run_id', 'started_at', 'batches': [{'batch_index', 'message_ids', 'status', 'response'}]}, or None.
+        """
+        self.cursor.execute("SELECT run_id, started_at FROM processing_runs WHERE status = 'running' ORDER BY started_at DESC LIMIT 1")
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        run_id, started_at = row
+        self.cursor.execute("SELECT batch_index, message_ids, status, response FROM processing_batches WHERE run_id = ? ORDER BY batch_index", (run_id,))
+        batches = [{'batch_index': batch_index, 'message_ids': json.loads(message_ids), 'status': status, 'response': response}
+                   for batch_index, message_ids, status, response in self.cursor.fetchall()]
+        return {'run_id': run_id, 'started_at': started_at, 'batches': batches}
+
+    def record_batch_response(self, run_id, batch_index, response):
+        """Journals the raw model response of a batch before it is applied."""
+        self._write(lambda cursor: cursor.execute(
+            "UPDATE processing_batches SET status = 'answered', response = ?, error = NULL, updated_at = ? WHERE run_id = ? AND batch_index = ?",
+            (response, datetime.now().isoformat(), run_id, batch_index)).rowcount)
+
+    def record_batch_failure(self, run_id, batch_index, error):
+        """Marks a batch failed; a response it already received is kept for the resumed run."""
+        self._write(lambda cursor: cursor.execute(
+            "UPDATE processing_batches SET status = 'failed', error = ?, updated_at = ? WHERE run_id = ? AND batch_index = ?",
+            (error, datetime.now().isoformat(), run_id, batch_index)).rowcount)
+
+    def finish_processing_run(self, run_id, keep_runs=10):
+        """Marks a run finished and drops the journals of all but the `keep_runs` latest finished runs."""
+        def finish(cursor):
+            cursor.execute("UPDATE processing_runs SET status = 'completed', finished_at = ? WHERE run_id = ?",
+                           (datetime.now().isoformat(), run_id))
+            cursor.execute("""
+                SELECT run_id FROM processing_runs WHERE status = 'completed'
+                ORDER BY started_at DESC LIMIT -1 OFFSET ?
+            """, (keep_runs,))
+            old_runs = cursor.fetchall()
+            # Deleted explicitly, foreign keys may not be enforced on this connection
+            cursor.executemany("DELETE FROM processing_batches WHERE run_id = ?", old_runs)
+            cursor.executemany("DELETE FROM processing_runs WHERE run_id = ?", old_runs)
+        self._write(finish)
 
     def delete_message(self, message_id):
-        self.cursor.execute("DELETE FROM messages WHERE id = ?", (message_id,))
-        self.conn.commit()
+        self._write(lambda cursor: cursor.execute("DELETE FROM messages WHERE id = ?", (message_id,)).rowcount)
+
+    def get_change_versions(self):
+        """Returns the change counters kept by the change_versions triggers as {scope: version}."""
+        self.cursor.execute("SELECT scope, version FROM change_versions")
+        return dict(self.cursor.fetchall())
+
+    def _attach_images(self, messages, where_clause="", params=()):
+        """
+        Attaches an `images` list to every message using one query over message_images,
+        restricted with the same WHERE clause that selected the messages.
+        """
+        by_id = {}
+        for msg in messages:
+            msg['images'] = []
+            by_id[msg['id']] = msg
+        if not messages:
+            return messages
+
+        self.cursor.execute(f"""
+            SELECT message_id, id, file_path, description, created_at
+            FROM message_images
+            WHERE message_id IN (SELECT id FROM messages {where_clause})
+            ORDER BY id
+        """, params)
+        for message_id, img_id, file_path, description, created_at in self.cursor.fetchall():
+            msg = by_id.get(message_id)
+            if msg is not None:
+                msg['images'].append({
+                    "id": img_id,
+                    "file_path": file_path,
+                    "description": description,
+                    "created_at": created_at
+                })
+        return messages
 
-    def get_project_messages(self, project_name=None, only_unprocessed=False):
+    def get_project_messages(self, project_name=None, only_unprocessed=False, with_images=False, limit=None):
         # gets all messages if no name is specified
+        # with_images=True attaches each message's images in a single extra query
+        # limit=N returns only the N oldest messages (by timestamp)
+        conditions = []
+        params = []
         if project_name:
-            if only_unprocessed:
-                self.cursor.execute("SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages WHERE project = ? AND processed = 0", (project_name,))
-            else:
-                self.cursor.execute("SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages WHERE project = ?", (project_name,))
-        else:
-            if only_unprocessed:
-                self.cursor.execute("SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages WHERE processed = 0")
-            else:
-                self.cursor.execute("SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages")
+            conditions.append("project = ?")
+            params.append(project_name)
+        if only_unprocessed:
+            conditions.append("processed = 0")
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "ORDER BY timestamp, id LIMIT ?"
+            params.append(int(limit))
+
+        self.cursor.execute(f"SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages {where_clause} {limit_clause}", params)
 
         rows = self.cursor.fetchall()
         messages = []
@@ -209,14 +583,198 @@ class MessageDatabaseHandler:
                 "reoccurences": row[9] if len(row) > 9 else None,
                 "done": bool(row[10]) if len(row) > 10 else False
             })
+        if with_images:
+            if limit is not None:
+                self._attach_images(messages, "WHERE id IN (%s)" % ",".join("?" * len(messages)), [m['id'] for m in messages])
+            else:
+                self._attach_images(messages, where_clause, params)
         return messages
 
-    def get_reminder_messages(self):
+    def get_message(self, message_id, with_images=True):
+        """Returns a single message (with its images) as a dict, or None if it doesn't exist."""
+        self.cursor.execute("SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages WHERE id = ?", (message_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        message = {
+            "id": row[0],
+            "content": row[1],
+            "timestamp": row[2],
+            "project": row[3],
+            "files": row[4],
+            "extra": row[5],
+            "processed": bool(row[6]),
+            "remind": row[7],
+            "importance": row[8],
+            "reoccurences": row[9],
+            "done": bool(row[10])
+        }
+        if with_images:
+            self._attach_images([message], "WHERE id = ?", (message_id,))
+        return message
+
+    def get_messages_page(self, project_name=None, limit=50, before_timestamp=None, before_id=None, with_images=True):
+        """
+        Keyset-paginated messages, newest first (ORDER BY timestamp DESC, id DESC).
+        Returns up to `limit` messages strictly older than the (before_timestamp, before_id) cursor;
+        with only before_timestamp set, returns messages with an older timestamp.
+        No project_name means all messages, like get_project_messages.
+        """
+        conditions = []
+        params = []
+        if project_name:
+            conditions.append("project = ?")
+            params.append(project_name)
+        if before_timestamp is not None:
+            if before_id is not None:
+                conditions.append("(timestamp, id) < (?, ?)")
+                params.extend([before_timestamp, int(before_id)])
+            else:
+                conditions.append("timestamp < ?")
+                params.append(before_timestamp)
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        self.cursor.execute(f"""
+            SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done
+            FROM messages
+            {where_clause}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        """, params + [int(limit)])
+        rows = self.cursor.fetchall()
+        messages = []
+        for row in rows:
+            messages.append({
+                "id": row[0],
+                "content": row[1],
+                "timestamp": row[2],
+                "project": row[3],
+                "files": row[4],
+                "extra": row[5],
+                "processed": bool(row[6]),
+                "remind": row[7],
+                "importance": row[8],
+                "reoccurences": row[9],
+                "done": bool(row[10])
+            })
+        if with_images and messages:
+            # Restrict the image lookup to exactly the ids on this page
+            placeholders = ", ".join("?" for _ in messages)
+            self._attach_images(messages, f"WHERE id IN ({placeholders})", [m['id'] for m in messages])
+        return messages
+
+    def search_messages(self, text, project_name=None, limit=50, match_any=False):
+        """
+        Full-text search over message text and image descriptions, best matches first (BM25).
+        Each result carries `score` (higher is better) and a `snippet` with matches in [brackets].
+        match_any=True returns messages containing any of the words instead of all of them.
+        """
+        match_query = build_match_query(text, prefix_last=not match_any, match_any=match_any)
+        if match_query is None:
+            return []
+        if not self._has_table("messages_fts"):
+            return self._search_messages_like(text, project_name, limit, match_any)
+        params = [match_query]
+        project_clause = ""
+        if project_name:
+            project_clause = "AND m.project = ?"
+            params.append(project_name)
+        params.append(int(limit))
+
+        # Message text weighs twice as much as image descriptions
+        self.cursor.execute(f"""
+            SELECT m.id, m.content, m.timestamp, m.project, m.files, m.extra, m.processed, m.remind, m.importance, m.reoccurences, m.done,
+                   bm25(messages_fts, 2.0, 1.0) AS rank,
+                   snippet(messages_fts, -1, '[', ']', '…', 12) AS snippet
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            WHERE messages_fts MATCH ? {project_clause}
+            ORDER BY rank
+            LIMIT ?
+        """, params)
+        results = []
+        for row in self.cursor.fetchall():
+            results.append({
+                "id": row[0],
+                "content": row[1],
+                "timestamp": row[2],
+                "project": row[3],
+                "files": row[4],
+                "extra": row[5],
+                "processed": bool(row[6]),
+                "remind": row[7],
+                "importance": row[8],
+                "reoccurences": row[9],
+                "done": bool(row[10]),
+                "score": -row[11],
+                "snippet": row[12]
+            })
+        if results:
+            placeholders = ", ".join("?" for _ in results)
+            self._attach_images(results, f"WHERE id IN ({placeholders})", [r['id'] for r in results])
+        return results
+
+    def _search_messages_like(self, text, project_name=None, limit=50, match_any=False):
+        """
+        search_messages without FTS5: LIKE matching of every word (any word with match_any) in
+        the message text or its image descriptions. `score` is the number of distinct words
+        matched, ties newest first.
+        """
+        terms = list(dict.fromkeys(search_terms(text)))
+        term_conditions = []
+        score_parts = []
+        params = []
+        for term in terms:
+            pattern = like_pattern(term)
+            condition = ("(m.content LIKE ? ESCAPE '\\' OR EXISTS (SELECT 1 FROM message_images mi "
+                         "WHERE mi.message_id = m.id AND mi.description LIKE ? ESCAPE '\\'))")
+            term_conditions.append(condition)
+            score_parts.append(f"CASE WHEN {condition} THEN 1 ELSE 0 END")
+            params.extend([pattern, pattern])
+        params = params + params  # once for the score, once for the WHERE
+        where_clause = f"({(' OR ' if match_any else ' AND ').join(term_conditions)})"
+        if project_name:
+            where_clause += " AND m.project = ?"
+            params.append(project_name)
+        params.append(int(limit))
+
+        self.cursor.execute(f"""
+            SELECT m.id, m.content, m.timestamp, m.project, m.files, m.extra, m.processed, m.remind, m.importance, m.reoccurences, m.done,
+                   {' + '.join(score_parts)} AS score
+            FROM messages m
+            WHERE {where_clause}
+            ORDER BY score DESC, m.timestamp DESC, m.id DESC
+            LIMIT ?
+        """, params)
+        results = []
+        for row in self.cursor.fetchall():
+            results.append({
+                "id": row[0],
+                "content": row[1],
+                "timestamp": row[2],
+                "project": row[3],
+                "files": row[4],
+                "extra": row[5],
+                "processed": bool(row[6]),
+                "remind": row[7],
+                "importance": row[8],
+                "reoccurences": row[9],
+                "done": bool(row[10]),
+                "score": float(row[11]),
+                "snippet": make_snippet(row[1], terms)
+            })
+        if results:
+            placeholders = ", ".join("?" for _ in results)
+            self._attach_images(results, f"WHERE id IN ({placeholders})", [r['id'] for r in results])
+        return results
+
+    def get_reminder_messages(self, with_images=False):
         """Fetches all messages that have a reminder set (done or not done)."""
-        self.cursor.execute("""
+        where_clause = "WHERE remind IS NOT NULL AND remind != ''"
+        self.cursor.execute(f"""
             SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done
             FROM messages
-            WHERE remind IS NOT NULL AND remind != ''
+            {where_clause}
             ORDER BY done ASC, remind ASC  -- Show active first, then ordered by time
         """)
         rows = self.cursor.fetchall()
@@ -235,8 +793,14 @@ class MessageDatabaseHandler:
                 "reoccurences": row[9],
                 "done": bool(row[10])
             })
+        if with_images:
+            self._attach_images(messages, where_clause)
         return messages
 
     def close(self):
+        # The connection goes back to the pool instead of being closed
         if self.conn:
-            self.conn.close()
+            self.cursor.close()
+            ConnectionPool.release(self.db_name, self.conn)
+            self.conn = None
+            self.cursor = None
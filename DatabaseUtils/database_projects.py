@@ -1,6 +1,8 @@
 import sqlite3
 import os
 import sys # Import sys
+from datetime import datetime
+from DatabaseUtils.connection_pool import ConnectionPool
 
 class ProjectsDatabaseHandler:
     _projects = None
@@ -27,10 +29,11 @@ class ProjectsDatabaseHandler:
         self.conn = None
         self.cursor = None
         self._connect()
-        self._create_table()
+        ConnectionPool.ensure_schema(self.db_name, self._create_table)
 
     def _connect(self):
-        self.conn = sqlite3.connect(self.db_name)
+        # Connections come from the shared pool, so creating a handler is cheap
+        self.conn = ConnectionPool.acquire(self.db_name)
         self.cursor = self.conn.cursor()
 
     def _create_table(self):
@@ -49,6 +52,29 @@ class ProjectsDatabaseHandler:
         self._migrate_add_column('color', 'TEXT DEFAULT "#dddddd"')
         self._migrate_add_column('emoji', 'TEXT DEFAULT "📁"') # Default emoji
 
+        # Per-project context used in model prompts (see ModelClient.build_projects_prompt),
+        # rebuilt only when the project's messages (source_version) or description change
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS project_digests (
+                project_name TEXT PRIMARY KEY,
+                description TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                token_count INTEGER NOT NULL,
+                source_version INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        # High-water mark of project discovery (ModelClient.check_for_new_projects): the
+        # highest message id already considered
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS project_discovery (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_message_id INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
     def _migrate_add_column(self, column_name, column_type):
         """Adds a column to the projects table if it doesn't exist."""
         self.cursor.execute(f"PRAGMA table_info(projects)")
@@ -141,10 +167,57 @@ class ProjectsDatabaseHandler:
         ProjectsDatabaseHandler._projects = projects
         return projects
 
+    def get_project_digests(self):
+        """Returns the stored project digests as {project_name: {'description', 'digest', 'token_count', 'source_version'}}."""
+        self.cursor.execute("SELECT project_name, description, digest, token_count, source_version FROM project_digests")
+        return {
+            row[0]: {"description": row[1], "digest": row[2], "token_count": row[3], "source_version": row[4]}
+            for row in self.cursor.fetchall()
+        }
+
+    def save_project_digests(self, digests, keep_names=None):
+        """
+        Stores digests ({project_name: {'description', 'digest', 'token_count', 'source_version'}})
+        and, with `keep_names`, drops the digests of every other project (deleted or renamed).
+        """
+        now = datetime.now().isoformat()
+        try:
+            self.cursor.executemany("""
+                INSERT OR REPLACE INTO project_digests (project_name, description, digest, token_count, source_version, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(name, d["description"], d["digest"], d["token_count"], d["source_version"], now) for name, d in digests.items()])
+            if keep_names is not None:
+                self.cursor.execute("SELECT project_name FROM project_digests")
+                stale = [(name,) for (name,) in self.cursor.fetchall() if name not in keep_names]
+                self.cursor.executemany("DELETE FROM project_digests WHERE project_name = ?", stale)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error saving project digests: {e}")
+            self.conn.rollback()
+
+    def get_discovery_mark(self):
+        """Returns the highest message id already considered by project discovery (0 if never run)."""
+        self.cursor.execute("SELECT last_message_id FROM project_discovery WHERE id = 1")
+        row = self.cursor.fetchone()
+        return row[0] if row else 0
+
+    def set_discovery_mark(self, last_message_id):
+        try:
+            self.cursor.execute("INSERT OR REPLACE INTO project_discovery (id, last_message_id, updated_at) VALUES (1, ?, ?)",
+                                (int(last_message_id), datetime.now().isoformat()))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error saving project discovery mark: {e}")
+            self.conn.rollback()
+
     @classmethod
     def get_projects(cls):
         return cls._projects
 
     def close(self):
+        # The connection goes back to the pool instead of being closed
         if self.conn:
-            self.conn.close()
+            self.cursor.close()
+            ConnectionPool.release(self.db_name, self.conn)
+            self.conn = None
+            self.cursor = None
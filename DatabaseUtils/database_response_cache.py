@@ -0,0 +1,142 @@
+import sqlite3
+import os
+import sys
+import time
+from DatabaseUtils.connection_pool import ConnectionPool
+
+
+class ResponseCacheDatabaseHandler:
+    """
+    On-disk cache of model responses (model_cache.db), keyed by a hash of everything that
+    determines the response (see ModelClient._response_cache_key).
+
+    Entries expire after `ttl_seconds`; when the cached responses grow past `max_bytes`, the
+    least recently used ones are evicted.
+    """
+    DEFAULT_TTL_SECONDS = 24 * 3600
+    DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+    def __init__(self, db_name=None, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        if db_name is None:
+            if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+                app_support_dir = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support', 'RemainderApp')
+            else:
+                # Using local "Databases" for non-frozen (dev) mode:
+                app_support_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Databases")
+
+            os.makedirs(app_support_dir, exist_ok=True)
+            self.db_name = os.path.join(app_support_dir, "model_cache.db")
+        else:
+            self.db_name = db_name
+            db_dir = os.path.dirname(self.db_name)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.conn = None
+        self.cursor = None
+        self._connect()
+        ConnectionPool.ensure_schema(self.db_name, self._create_table)
+
+    def _connect(self):
+        # WAL so concurrent chunk requests can read while another one stores its response
+        self.conn = ConnectionPool.acquire(self.db_name, wal=True)
+        self.cursor = self.conn.cursor()
+
+    def _create_table(self):
+        try:
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    json_mode INTEGER NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            # LRU eviction order
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used_at)")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error creating response_cache table: {e}")
+
+    def get(self, cache_key):
+        """Returns the cached response for `cache_key`, or None if missing or expired."""
+        now = time.time()
+        try:
+            self.cursor.execute("SELECT response, created_at FROM response_cache WHERE cache_key = ?", (cache_key,))
+            row = self.cursor.fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self.cursor.execute("DELETE FROM response_cache WHERE cache_key = ?", (cache_key,))
+                self.conn.commit()
+                return None
+            self.cursor.execute("UPDATE response_cache SET last_used_at = ? WHERE cache_key = ?", (now, cache_key))
+            self.conn.commit()
+            return response
+        except sqlite3.Error as e:
+            print(f"Error reading response cache: {e}")
+            self.conn.rollback()
+            return None
+
+    def put(self, cache_key, model, json_mode, response):
+        """Stores a response, then evicts expired and least recently used entries over max_bytes."""
+        now = time.time()
+        try:
+            self.cursor.execute("""
+                INSERT OR REPLACE INTO response_cache (cache_key, model, json_mode, response, size, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (cache_key, model, int(json_mode), response, len(response.encode("utf-8")), now, now))
+            self._evict(now)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing response cache: {e}")
+            self.conn.rollback()
+
+    def _evict(self, now):
+        if self.ttl_seconds:
+            self.cursor.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.cursor.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache")
+        excess = self.cursor.fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        evict_keys = []
+        self.cursor.execute("SELECT cache_key, size FROM response_cache ORDER BY last_used_at")
+        for cache_key, size in self.cursor.fetchall():
+            if excess <= 0:
+                break
+            evict_keys.append((cache_key,))
+            excess -= size
+        self.cursor.executemany("DELETE FROM response_cache WHERE cache_key = ?", evict_keys)
+
+    def get_stats(self):
+        try:
+            self.cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache")
+            entries, size_bytes = self.cursor.fetchone()
+            return {"entries": entries, "size_bytes": size_bytes}
+        except sqlite3.Error as e:
+            print(f"Error getting response cache stats: {e}")
+            return {"entries": 0, "size_bytes": 0}
+
+    def clear(self):
+        try:
+            self.cursor.execute("DELETE FROM response_cache")
+            self.conn.commit()
+            return self.cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Error clearing response cache: {e}")
+            self.conn.rollback()
+            return 0
+
+    def close(self):
+        # The connection goes back to the pool instead of being closed
+        if self.conn:
+            self.cursor.close()
+            ConnectionPool.release(self.db_name, self.conn)
+            self.conn = None
+            self.cursor = None
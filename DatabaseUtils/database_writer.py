@@ -0,0 +1,156 @@
+import sqlite3
+import os
+import queue
+import threading
+
+from DatabaseUtils.connection_pool import ConnectionPool
+
+
+class _WriteRequest:
+    def __init__(self, work):
+        self.work = work
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DatabaseWriter:
+    """
+    Single writer thread for one SQLite database.
+
+    Every write is submitted as a callable taking a cursor and runs on the writer's own
+    connection. Requests that queue up while a transaction is running are applied together
+    and committed once, each inside its own SAVEPOINT so a failing statement only rolls back
+    its own request. Callers block until their request is committed and get back whatever
+    the callable returned (e.g. lastrowid). Readers keep using pooled connections and, in WAL
+    mode, never wait on the writer.
+
+    Once stopped (stop_all, or its thread died), a writer takes no more requests: submit()
+    hands them to the current writer for the database from for_db() instead.
+    """
+    MAX_BATCH = 64
+
+    _writers = {}  # {db_path: DatabaseWriter}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, db_name):
+        self.db_name = os.path.abspath(db_name)
+        self._queue = queue.Queue()
+        self._stopped = False
+        self._state_lock = threading.Lock()  # orders the stop sentinel after every accepted request
+        self._thread = threading.Thread(target=self._run, name=f"DatabaseWriter({os.path.basename(self.db_name)})", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def for_db(cls, db_name):
+        """Returns the process-wide writer for `db_name`, starting it on first use."""
+        db_path = os.path.abspath(db_name)
+        with cls._registry_lock:
+            writer = cls._writers.get(db_path)
+            if writer is None or writer._stopped or not writer._thread.is_alive():
+                writer = cls(db_path)
+                cls._writers[db_path] = writer
+            return writer
+
+    @classmethod
+    def stop_all(cls):
+        """Flushes and stops every writer thread (e.g. on application shutdown)."""
+        with cls._registry_lock:
+            writers = list(cls._writers.values())
+            cls._writers = {}
+        for writer in writers:
+            writer._stop()
+        for writer in writers:
+            writer._thread.join(timeout=5)
+
+    def _stop(self):
+        with self._state_lock:
+            if not self._stopped:
+                self._stopped = True
+                self._queue.put(None)
+
+    def submit(self, work, _reroute=True):
+        """Runs `work(cursor)` on the writer thread and returns its result once committed."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("DatabaseWriter.submit() called from the writer thread itself")
+        request = _WriteRequest(work)
+        with self._state_lock:
+            stopped = self._stopped
+            if not stopped:
+                self._queue.put(request)
+        if stopped:
+            if not _reroute:
+                raise RuntimeError(f"DatabaseWriter for {self.db_name} is stopped")
+            # A handler can outlive stop_all(); its writes go to the database's current writer
+            return DatabaseWriter.for_db(self.db_name).submit(work, _reroute=False)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self):
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_name, isolation_level=None)  # transactions are managed explicitly
+            ConnectionPool.apply_pragmas(conn)
+            cursor = conn.cursor()
+            stopping = False
+            while not stopping:
+                request = self._queue.get()
+                if request is None:
+                    break
+                batch = [request]
+                while len(batch) < self.MAX_BATCH:
+                    try:
+                        request = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+                self._apply_batch(conn, cursor, batch)
+        except Exception as e:
+            print(f"[DatabaseWriter] Writer for {self.db_name} stopped on error: {e}")
+        finally:
+            with self._state_lock:
+                self._stopped = True
+            self._fail_pending()
+            if conn is not None:
+                conn.close()
+
+    def _fail_pending(self):
+        """Releases callers whose requests are still queued when the thread exits (only after an error)."""
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None:
+                request.error = RuntimeError(f"DatabaseWriter for {self.db_name} stopped before this write ran")
+                request.done.set()
+
+    def _apply_batch(self, conn, cursor, batch):
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                cursor.execute("SAVEPOINT write_request")
+                try:
+                    request.result = request.work(cursor)
+                    cursor.execute("RELEASE write_request")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_request")
+                    cursor.execute("RELEASE write_request")
+                    request.error = e
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"[DatabaseWriter] Batch of {len(batch)} writes to {self.db_name} failed: {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            for request in batch:
+                if request.error is None:
+                    request.result = None
+                    request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
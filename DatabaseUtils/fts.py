@@ -0,0 +1,66 @@
+import re
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text, prefix_last=True, match_any=False):
+    """
+    Turns free text typed by the user into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so FTS5 operators and punctuation in the input can't cause syntax
+    errors) and all words must match, or any of them with `match_any` (used to rank
+    candidates for a natural-language question, where BM25 sorts out the noise words).
+    With `prefix_last` the last word is matched as a prefix so results show up while the
+    user is still typing; single characters are not, since they would match nearly every
+    row. Returns None if the text contains no searchable word.
+    """
+    tokens = _TOKEN_RE.findall(text or "")
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix_last and len(tokens[-1]) >= 2:
+        terms[-1] += "*"
+    return (" OR " if match_any else " ").join(terms)
+
+
+def search_terms(text):
+    """The words of `text` as searched by the LIKE fallback (same tokenization as build_match_query)."""
+    return [token.casefold() for token in _TOKEN_RE.findall(text or "")]
+
+
+def like_pattern(term):
+    """A LIKE pattern matching `term` anywhere, for use with ESCAPE '\\'."""
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def make_snippet(text, terms, width=60):
+    """
+    A snippet of `text` around the first occurrence of any of `terms`, with the terms in
+    [brackets] like the FTS5 snippet() used when full-text search is available.
+    """
+    text = text or ""
+    lowered = text.casefold()
+    positions = [lowered.find(term) for term in terms if term and lowered.find(term) >= 0]
+    start = max(0, min(positions) - width // 2) if positions else 0
+    end = min(len(text), start + width * 2)
+    snippet = text[start:end]
+    alternatives = "|".join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True) if term)
+    if alternatives:
+        snippet = re.sub(alternatives, lambda m: f"[{m.group(0)}]", snippet, flags=re.IGNORECASE)
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+
+
+def fuse_rankings(ranked_lists, k=60):
+    """
+    Merges result lists from separate indexes (e.g. messages and clips), each best first, by
+    reciprocal rank fusion: an item's `score` becomes 1 / (k + its rank in its own list).
+    Raw BM25 scores of different indexes aren't comparable (they depend on each index's
+    document count and term statistics), ranks are. Returns a new list, best first.
+    """
+    fused = []
+    for results in ranked_lists:
+        for rank, result in enumerate(results, start=1):
+            fused.append(dict(result, score=1.0 / (k + rank)))
+    fused.sort(key=lambda r: r['score'], reverse=True)  # stable: ties keep list order
+    return fused
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+# generate_with_gemini sends "<prompt>\nContext:\n<messages>" as the user turn; only the prompt belongs in history
+CONTEXT_MARKER = "\nContext:\n"
+
+
+class ChatHistoryStore:
+    """
+    Model chat histories per context (see Api._get_context_key), bounded in two ways:
+
+    - each history is kept under `token_budget` tokens by dropping its oldest turns (the latest
+      exchange is always kept), so the history replayed on every turn stops growing;
+    - at most `max_contexts` histories are kept, the least recently used one is evicted first.
+
+    Turns are stored in the serialized form ModelClient.generate returns (dicts with `role`
+    and `parts`); a message context accidentally left in a user turn is stripped on the way in.
+    """
+
+    def __init__(self, count_tokens, token_budget=8000, max_contexts=20):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.max_contexts = max_contexts
+        self._histories = OrderedDict()  # {context key: [turn, ...]}, least recently used first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _turn_text(turn):
+        parts = turn.get("parts") if isinstance(turn, dict) else getattr(turn, "parts", None)
+        texts = []
+        for part in parts or []:
+            text = part.get("text") if isinstance(part, dict) else getattr(part, "text", None)
+            if isinstance(text, str):
+                texts.append(text)
+        return "\n".join(texts)
+
+    @staticmethod
+    def _strip_context(turn):
+        """Returns the turn without any message context appended to its text parts."""
+        if not isinstance(turn, dict) or not isinstance(turn.get("parts"), list):
+            return turn
+        parts = []
+        for part in turn["parts"]:
+            if isinstance(part, dict) and isinstance(part.get("text"), str) and CONTEXT_MARKER in part["text"]:
+                part = dict(part, text=part["text"].split(CONTEXT_MARKER, 1)[0])
+            parts.append(part)
+        return dict(turn, parts=parts)
+
+    def _trim(self, history):
+        turns = [self._strip_context(turn) for turn in history]
+        tokens = [self.count_tokens(self._turn_text(turn)) for turn in turns]
+        total = sum(tokens)
+        start = 0
+        # Drop the oldest turns until within budget, but never the latest exchange (user + model)
+        while total > self.token_budget and start < len(turns) - 2:
+            total -= tokens[start]
+            start += 1
+        # Don't leave a model reply without the user turn it answered at the front
+        while start < len(turns) - 1 and isinstance(turns[start], dict) and turns[start].get("role") == "model":
+            total -= tokens[start]
+            start += 1
+        if start:
+            print(f"[ChatHistory] Dropped {start} old turns to stay within {self.token_budget} tokens.")
+        return turns[start:]
+
+    def get(self, context_key):
+        """Returns a copy of the history of a context (empty if none)."""
+        with self._lock:
+            history = self._histories.get(context_key)
+            if history is None:
+                return []
+            self._histories.move_to_end(context_key)
+            return list(history)
+
+    def set(self, context_key, history):
+        trimmed = self._trim(history or [])
+        with self._lock:
+            self._histories[context_key] = trimmed
+            self._histories.move_to_end(context_key)
+            while len(self._histories) > self.max_contexts:
+                evicted_key, _ = self._histories.popitem(last=False)
+                print(f"[ChatHistory] Evicted history of context {evicted_key}.")
+
+    def reset(self, context_key):
+        with self._lock:
+            self._histories.pop(context_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._histories.clear()
@@ -0,0 +1,156 @@
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# Message records ("ID: 12, ...") and project headers ("Project: name") in prompts/contexts
+_ID_RE = re.compile(r"ID: (\w+)")
+_PROJECT_RE = re.compile(r"^Project: (.+)$", re.MULTILINE)
+
+
+class FakeAPIError(Exception):
+    """Error shaped like the SDK's API errors (an HTTP status in `code`)."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None  # no calibration data, the token estimator keeps its ratio
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        return self._client._respond(contents, config)
+
+    def generate_content_stream(self, model, contents, config=None):
+        text = self._client._respond(contents, config).text
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self._client.stream_delay)
+            yield FakeResponse(word if i == len(words) - 1 else word + " ")
+
+
+class _FakeCaches:
+    """Stand-in for client.caches: remembers the text of every cached content by name."""
+
+    def __init__(self, client):
+        self._client = client
+        self._contents = {}
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, config=None):
+        with self._lock:
+            self._created += 1
+            name = f"cachedContents/fake-{self._created}"
+            self._contents[name] = self._client._texts(getattr(config, "contents", None))
+        return SimpleNamespace(name=name, model=model)
+
+    def delete(self, name):
+        with self._lock:
+            if self._contents.pop(name, None) is None:
+                raise FakeAPIError(404, f"Cached content {name} not found")
+
+    def texts(self, name):
+        with self._lock:
+            texts = self._contents.get(name)
+        if texts is None:
+            raise FakeAPIError(404, f"Cached content {name} not found")
+        return texts
+
+
+class FakeModelClient:
+    """
+    Offline stand-in for genai.Client, used by ModelClient(mode="fake").
+
+    Exposes the same `client.models.generate_content(...)` / `generate_content_stream(...)`
+    surface (plus `client.caches` for context caching) and answers deterministically (for a given seed and request) with outputs shaped
+    like Gemini's for every mode ModelClient uses: free text, select messages, assign projects,
+    create projects and image descriptions. `latency` (+ random `jitter`) seconds are slept per
+    request so the pipeline can be load-tested without network or quota.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.0, seed=0, stream_delay=0.01):
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+        self.stream_delay = stream_delay
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches(self)
+        self._lock = threading.Lock()
+        self.request_count = 0
+
+    @staticmethod
+    def _texts(contents):
+        """All text parts of the request, whether SDK Content objects or plain dicts."""
+        texts = []
+        for content in contents or []:
+            parts = content.get("parts", []) if isinstance(content, dict) else getattr(content, "parts", None) or []
+            for part in parts:
+                text = part.get("text") if isinstance(part, dict) else getattr(part, "text", None)
+                if isinstance(text, str):
+                    texts.append(text)
+        return texts
+
+    @staticmethod
+    def _schema_mode(config):
+        """Which ModelClient json mode a request is, from the top-level properties of its response schema."""
+        schema = getattr(config, "response_schema", None)
+        properties = getattr(schema, "properties", None) or {}
+        if "projects" in properties:
+            return 3
+        if "messages" in properties:
+            item_properties = getattr(getattr(properties["messages"], "items", None), "properties", None) or {}
+            return 2 if "project" in item_properties else 1
+        return 0
+
+    def _respond(self, contents, config):
+        with self._lock:
+            self.request_count += 1
+        texts = self._texts(contents)
+        request_text = texts[-1] if texts else ""
+        cached_content = getattr(config, "cached_content", None)
+        if cached_content:
+            # The context was uploaded beforehand, answer as if it was sent with the prompt
+            request_text = "\n".join([request_text] + self.caches.texts(cached_content))
+        # Seeded by the request itself, so the same request always gets the same answer
+        rng = random.Random(f"{self.seed}\x1f{request_text}")
+        time.sleep(self.latency + rng.uniform(0, self.jitter))
+
+        if config is None and any("image_id" in text for text in texts):
+            return FakeResponse(self._describe_images(texts))
+        mode = self._schema_mode(config)
+        ids = list(dict.fromkeys(_ID_RE.findall(request_text)))
+        if mode == 1:
+            selected = rng.sample(ids, min(len(ids), 5))
+            return FakeResponse(json.dumps({"messages": [
+                {"id": msg_id, "first_words": "", "explanation": "Selected by the fake model."} for msg_id in selected]}))
+        if mode == 2:
+            projects = _PROJECT_RE.findall(request_text) + [""]
+            return FakeResponse(json.dumps({"messages": [
+                {"id": int(msg_id) if msg_id.isdigit() else msg_id, "project": rng.choice(projects), "why": "fake assignment"}
+                for msg_id in ids]}))
+        if mode == 3:
+            count = rng.randint(0, 2)
+            return FakeResponse(json.dumps({"projects": [
+                {"name": f"Fake Project {rng.randint(1, 20)}", "description": "Created by the fake model."} for _ in range(count)]}))
+        prompt = request_text.split("\nContext:\n", 1)[0]
+        return FakeResponse(f"Fake answer to: {prompt[:200]} (context had {len(ids)} messages)")
+
+    @staticmethod
+    def _describe_images(texts):
+        image_ids = []
+        for text in texts:
+            image_ids.extend(int(i) for i in re.findall(r"\(ID: (\d+)\)", text))
+        return json.dumps({"images": [
+            {"image_id": img_id, "description": f"Fake description of image {img_id}", "text_content": None}
+            for img_id in image_ids]})
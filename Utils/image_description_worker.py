@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from DatabaseUtils.database_messages import MessageDatabaseHandler
+
+
+class ImageDescriptionWorker:
+    """
+    Background worker that keeps describing images without a description (message_images).
+
+    A thread wakes up every `poll_interval` seconds, or right away on wake() (e.g. when an
+    image is added), reads the undescribed images in slices of `slice_size` (default: enough
+    for two rounds of full batches) and sends each slice to `describe` in batches of at most
+    `max_batch_images` images and `max_batch_bytes` bytes of image files, with up to
+    `max_concurrency` batches in flight. stop() takes effect between slices. Each batch's descriptions are written in one
+    transaction and reported to `on_described(count)`.
+
+    `describe(image_data)` gets a list of {'img_id', 'msg_id', 'file_path', 'context'} and
+    returns {img_id: description}; `resolve_path(db_path)` maps a stored file_path to the file
+    on disk. Images whose file is missing or that a batch failed to describe are retried only
+    after `retry_after` seconds.
+
+    drain_once() describes what is pending right now on a short-lived thread, without starting
+    the poll loop (for a "describe now" button while the worker is disabled).
+    """
+
+    def __init__(self, describe, resolve_path, on_described=None, db_name=None, max_concurrency=2,
+                 max_batch_images=8, max_batch_bytes=8 * 1024 * 1024, poll_interval=60, retry_after=900, slice_size=None):
+        self.describe = describe
+        self.resolve_path = resolve_path
+        self.on_described = on_described
+        self.db_name = db_name
+        self.max_concurrency = max_concurrency
+        self.max_batch_images = max_batch_images
+        self.max_batch_bytes = max_batch_bytes
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self.slice_size = slice_size
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._once_thread = None
+        self._lock = threading.Lock()
+        self._in_flight = set()  # image ids in a batch being described
+        self._retry_at = {}  # {image id: time before which it isn't picked again}
+        self._stats = {'described': 0, 'failed': 0, 'batches': 0, 'queue_depth': 0, 'last_error': None,
+                       'busy_seconds': 0.0}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ImageDescriptionWorker", daemon=True)
+        self._thread.start()
+        print(f"[ImageWorker] Started (up to {self.max_concurrency} concurrent requests).")
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self._wake_event.set()
+        for thread in (self._thread, self._once_thread):
+            if thread is not None:
+                thread.join(timeout=timeout)
+        self._thread = None
+        self._once_thread = None
+
+    def drain_once(self):
+        """
+        Describes the currently undescribed images in the background and returns right away.
+        Wakes the poll loop instead if it is running; returns False if a one-shot drain is
+        already in progress.
+        """
+        if self.running:
+            self.wake()
+            return True
+        with self._lock:
+            if self._once_thread is not None and self._once_thread.is_alive():
+                return False
+            self._stop_event.clear()
+            self._once_thread = threading.Thread(target=self._drain_logged, name="ImageDescriptionWorker-once", daemon=True)
+            self._once_thread.start()
+        return True
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wake(self):
+        """Makes the worker look for undescribed images now instead of at its next poll."""
+        self._wake_event.set()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        busy = stats.pop('busy_seconds')
+        stats['images_per_minute'] = round(stats['described'] * 60.0 / busy, 1) if busy else 0.0
+        stats['running'] = self.running
+        return stats
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._drain_logged()
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+
+    def _drain_logged(self):
+        try:
+            self._drain()
+        except Exception as e:
+            print(f"[ImageWorker] Error while describing images: {e}")
+            with self._lock:
+                self._stats['last_error'] = str(e)
+
+    def _claim_images(self, rows):
+        """
+        Returns the rows not already in a batch or waiting for a retry, marked as in flight.
+        Rows are read from the database before taking the lock; the check and the claim happen
+        under it, so a one-shot drain and the poll loop never describe the same image twice.
+        """
+        now = time.time()
+        with self._lock:
+            self._retry_at = {img_id: retry_at for img_id, retry_at in self._retry_at.items() if retry_at > now}
+            images = [image for image in rows if image['id'] not in self._in_flight and image['id'] not in self._retry_at]
+            self._in_flight.update(image['id'] for image in images)
+        return images
+
+    def _plan_batches(self, images):
+        batches = []
+        batch = []
+        batch_bytes = 0
+        for image in images:
+            full_path = self.resolve_path(image['file_path'])
+            if not os.path.exists(full_path):
+                print(f"[ImageWorker] Image file not found: {full_path}")
+                with self._lock:
+                    self._in_flight.discard(image['id'])
+                    self._retry_at[image['id']] = time.time() + self.retry_after
+                continue
+            size = os.path.getsize(full_path)
+            if batch and (len(batch) >= self.max_batch_images or batch_bytes + size > self.max_batch_bytes):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append({'img_id': image['id'], 'msg_id': image['message_id'], 'file_path': full_path, 'context': image['content']})
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _drain(self):
+        """Describes the currently undescribed images slice by slice, returns once all are done or on stop()."""
+        db = MessageDatabaseHandler(db_name=self.db_name)
+        try:
+            after_id = 0
+            while not self._stop_event.is_set():
+                slice_size = self.slice_size or 2 * max(1, self.max_concurrency) * max(1, self.max_batch_images)
+                rows = db.get_undescribed_images(limit=slice_size, after_id=after_id)
+                if not rows:
+                    break
+                after_id = rows[-1]['id']
+                images = self._claim_images(rows)
+                remaining = db.count_undescribed_images(after_id=after_id)
+                with self._lock:
+                    self._stats['queue_depth'] = len(images) + remaining
+                batches = self._plan_batches(images)
+                if not batches:
+                    continue
+                print(f"[ImageWorker] Describing {sum(len(batch) for batch in batches)} images in {len(batches)} batches "
+                      f"({remaining} more queued).")
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(batches)))) as executor:
+                    for batch in batches:
+                        executor.submit(self._describe_batch, batch)
+                with self._lock:
+                    self._stats['busy_seconds'] += time.perf_counter() - started  # wall time, for the throughput
+        finally:
+            db.close()
+
+    def _describe_batch(self, batch):
+        if self._stop_event.is_set():
+            with self._lock:
+                self._in_flight.difference_update(img['img_id'] for img in batch)
+            return
+        db = MessageDatabaseHandler(db_name=self.db_name)
+        descriptions = {}
+        error = None
+        try:
+            descriptions = {img_id: description for img_id, description in (self.describe(batch) or {}).items() if description}
+            db.update_image_descriptions(descriptions)  # one transaction per batch
+        except Exception as e:
+            error = str(e)
+            descriptions = {}
+            print(f"[ImageWorker] Batch of {len(batch)} images failed: {e}")
+        finally:
+            db.close()
+        missing = [img['img_id'] for img in batch if img['img_id'] not in descriptions]
+        with self._lock:
+            self._in_flight.difference_update(img['img_id'] for img in batch)
+            for img_id in missing:
+                self._retry_at[img_id] = time.time() + self.retry_after
+            self._stats['batches'] += 1
+            self._stats['described'] += len(descriptions)
+            self._stats['failed'] += len(missing)
+            self._stats['queue_depth'] = max(0, self._stats['queue_depth'] - len(batch))
+            if error:
+                self._stats['last_error'] = error
+        if descriptions and self.on_described:
+            self.on_described(len(descriptions))
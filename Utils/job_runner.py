@@ -0,0 +1,194 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function (see Job.check_cancelled) to stop it early."""
+
+
+class Job:
+    """
+    State of one background job, shared between the worker running it and the API polling it.
+
+    The job function reports progress through the job it is given: set_batches() once the
+    work is split, then batch_started()/batch_finished() per batch, and checks `cancelled`
+    (or calls check_cancelled()) between batches so cancel requests take effect.
+    """
+    # queued -> running -> completed | failed | cancelled
+    FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = "queued"
+        self.batches = []  # [{'index', 'size', 'status', 'error'}]
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def set_batches(self, sizes):
+        with self._lock:
+            self.batches = [{'index': i, 'size': size, 'status': 'pending', 'error': None} for i, size in enumerate(sizes)]
+
+    def batch_started(self, index):
+        with self._lock:
+            self.batches[index]['status'] = 'running'
+
+    def batch_finished(self, index, error=None):
+        with self._lock:
+            self.batches[index]['status'] = 'failed' if error else 'done'
+            self.batches[index]['error'] = error
+
+    @property
+    def progress(self):
+        """Percentage of the items (by batch size) whose batch is finished."""
+        with self._lock:
+            total = sum(batch['size'] for batch in self.batches)
+            done = sum(batch['size'] for batch in self.batches if batch['status'] in ('done', 'failed'))
+        if self.status == "completed":
+            return 100.0
+        return round(100.0 * done / total, 1) if total else 0.0
+
+    def to_dict(self, with_batches=True):
+        with self._lock:
+            batches = [dict(batch) for batch in self.batches]
+        info = {
+            'job_id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'progress': self.progress,
+            'batches_total': len(batches),
+            'batches_done': sum(1 for batch in batches if batch['status'] in ('done', 'failed')),
+            'batches_failed': sum(1 for batch in batches if batch['status'] == 'failed'),
+            'cancel_requested': self.cancelled,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if with_batches:
+            info['batches'] = batches
+        return info
+
+
+class JobRunner:
+    """
+    Runs long tasks (e.g. a full message-processing pass) on a small thread pool so the
+    pywebview bridge thread that started them returns right away. Jobs are looked up by id;
+    finished jobs are kept for `keep_finished_seconds` so their result can still be fetched.
+    """
+
+    def __init__(self, max_workers=2, keep_finished_seconds=3600):
+        self.keep_finished_seconds = keep_finished_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="JobRunner")
+        self._jobs = {}  # {job_id: Job}
+        self._lock = threading.Lock()
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Queues fn(*args, job=<Job>, **kwargs) and returns its Job."""
+        job = Job(name)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        print(f"[JobRunner] Queued job {job.id} ({name})")
+        return job
+
+    def submit_unique(self, name, fn, *args, **kwargs):
+        """
+        Like submit(), unless a job with this name is already queued or running: then that job
+        is returned. The check and the registration happen under one lock, so two callers
+        racing can't both start one. Returns (job, created).
+        """
+        with self._lock:
+            active = self._find_active_locked(name)
+            if active is not None:
+                return active, False
+            self._prune()
+            job = Job(name)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        print(f"[JobRunner] Queued job {job.id} ({name})")
+        return job, True
+
+    def _run(self, job, fn, args, kwargs):
+        job.started_at = time.time()
+        if job.cancelled:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        try:
+            job.result = fn(*args, job=job, **kwargs)
+            job.status = "completed"  # a cancel request that came too late to skip anything
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            print(f"[JobRunner] Job {job.id} ({job.name}) failed: {e}")
+            print(traceback.format_exc())
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            print(f"[JobRunner] Job {job.id} ({job.name}) {job.status}")
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.keep_finished_seconds]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find_active(self, name):
+        """Returns a queued or running job with this name, if any."""
+        with self._lock:
+            return self._find_active_locked(name)
+
+    def _find_active_locked(self, name):
+        for job in self._jobs.values():
+            if job.name == name and not job.finished:
+                return job
+        return None
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def shutdown(self):
+        """Asks every job to stop and returns without waiting for them."""
+        for job in self.list():
+            job.cancel()
+        self._executor.shutdown(wait=False)
@@ -3,18 +3,174 @@ import os
 import sys
 from google import genai
 from google.genai import types
+import hashlib
 import json as _json
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from Utils.prompts import sys_prompt_answer_question, sys_prompt_create_projects, sys_prompt_select_projects, sys_prompt_select_messages
+from Utils.token_counter import TokenCounter
+from DatabaseUtils.database_response_cache import ResponseCacheDatabaseHandler
+
+# Start of a message record in a context string ("ID: 12, ..."), used to chunk on message boundaries
+_RECORD_START_RE = re.compile(r"\n+(?=ID: )")
+
+
+class RequestScheduler:
+    """
+    Client-side scheduling shared by every Gemini call of a ModelClient.
+
+    - Token buckets for requests and tokens per minute, so bursts (parallel chunks, batch
+      processing) wait for quota locally instead of failing with 429.
+    - Jittered exponential backoff on transient errors (429, 5xx, connection errors).
+    - Identical requests in flight at the same time are sent once; the other callers wait
+      for and share its result.
+
+    `call()` takes any callable, so it can be exercised against a local fake client;
+    `clock` and `sleep` can be swapped out too.
+    """
+    RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=1000000, max_retries=5,
+                 base_delay=1.0, max_delay=30.0, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._last_refill = clock()
+        self._in_flight = {}  # {request key: Future}
+        self.retries = 0
+        self.coalesced = 0
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_allowance = min(self.requests_per_minute, self._request_allowance + elapsed * self.requests_per_minute / 60.0)
+        self._token_allowance = min(self.tokens_per_minute, self._token_allowance + elapsed * self.tokens_per_minute / 60.0)
+
+    def acquire(self, tokens=0):
+        """Blocks until one request and `tokens` tokens are available in the buckets, then takes them."""
+        tokens = min(tokens, self.tokens_per_minute)  # a single oversized request must still go through eventually
+        while True:
+            with self._lock:
+                self._refill()
+                if self._request_allowance >= 1 and self._token_allowance >= tokens:
+                    self._request_allowance -= 1
+                    self._token_allowance -= tokens
+                    return
+                # Time until both buckets have refilled enough
+                wait_requests = (1 - self._request_allowance) * 60.0 / self.requests_per_minute
+                wait_tokens = (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute
+                wait = max(wait_requests, wait_tokens, 0.01)
+            print(f"[RequestScheduler] Rate limit reached, waiting {wait:.2f}s")
+            self._sleep(wait)
+
+    def _is_retryable(self, error):
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return True
+        for attr in ("code", "status_code", "status"):
+            status = getattr(error, attr, None)
+            if isinstance(status, int):
+                return status in self.RETRYABLE_STATUS_CODES
+        return False
+
+    def _run_with_retry(self, fn, tokens):
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                # Full jitter: a random delay up to the exponential cap spreads out retrying callers
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                self.retries += 1
+                print(f"[RequestScheduler] Transient error ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                self._sleep(delay)
+
+    def call(self, fn, tokens=0, key=None):
+        """
+        Runs `fn()` within the rate limits, retrying transient failures. Callers passing the
+        same `key` while a request with that key is in flight get that request's result.
+        """
+        if key is None:
+            return self._run_with_retry(fn, tokens)
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self._run_with_retry(fn, tokens))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return future.result()
 
 
 class ModelClient:
-    def __init__(self, mode="gemini", model="gemini-2.5-flash-preview-04-17", model_context_window=500000):
+    # System prompt used for each json mode (0 = free-text answer)
+    SYSTEM_PROMPTS = {
+        0: sys_prompt_answer_question,
+        1: sys_prompt_select_messages,
+        2: sys_prompt_select_projects,
+        3: sys_prompt_create_projects,
+    }
+
+    # Backends: "gemini" talks to the Gemini API, "fake" to the offline FakeModelClient.
+    # Any object with the SDK's `models.generate_content(model, contents, config)` and
+    # `models.generate_content_stream(...)` can also be passed as `client`.
+    SUPPORTED_MODES = ("gemini", "fake")
+
+    def __init__(self, mode="gemini", model="gemini-2.5-flash-preview-04-17", model_context_window=500000, max_concurrency=4, response_cache=True, client=None):
         self.mode = mode
+        self.max_concurrency = max_concurrency  # concurrent chunk requests in the JSON modes
+
+        # Persistent response cache (Databases/model_cache.db) and its hit/miss counters
+        self.response_cache_enabled = response_cache
+        self.response_cache_ttl_seconds = ResponseCacheDatabaseHandler.DEFAULT_TTL_SECONDS
+        self.response_cache_max_bytes = ResponseCacheDatabaseHandler.DEFAULT_MAX_BYTES
+        self._cache_stats_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.model = model
         self.model_context_window = model_context_window
+        self.token_counter = TokenCounter(model=model)
+        self.scheduler = RequestScheduler()
+
+        # Provider-side context caching of large contexts that are sent again unchanged
+        self.context_cache_enabled = True
+        self.context_cache_min_tokens = 4096  # below the provider's minimum caching isn't possible or worth it
+        self.context_cache_ttl_seconds = 3600
+        self._context_caches = {}  # {(context_id, json): {'hash', 'name', 'expires_at', 'failed'}}
+        self._context_caches_lock = threading.Lock()
 
-        if mode == "gemini":
+        if client is not None:
+            self.gemini_client = client
+        elif mode == "fake":
+            from Utils.fake_model_client import FakeModelClient
+            self.gemini_client = FakeModelClient(latency=float(os.getenv("REMAINDER_FAKE_LATENCY", "0.5")))
+            self.response_cache_enabled = False  # fake answers must not end up in the real cache
+        elif mode == "gemini":
             # Determine base path for data files
             if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
                 # Running in a PyInstaller bundle
@@ -38,17 +194,41 @@ class ModelClient:
 
     def _count_tokens(self, text: str) -> int:
         """
-        Rough token estimation. One whitespace‑separated word is treated as one
-        token. Replace with the official Gemini tokenizer if/when it is
-        exposed by the SDK.
+        Token count of `text` from the TokenCounter: exact when the SDK ships a local
+        tokenizer for the model, otherwise a calibrated chars-per-token estimate.
         """
-        return len(text.split())
+        return self.token_counter.count(text)
 
-    def handle_length(self, prompt, messages="", overlap_words=50):
+    @staticmethod
+    def _split_records(messages):
+        """
+        Splits a context string into whole message records, each starting at an "ID: " line
+        (image description lines stay with their message). Returns (records, separator); falls
+        back to blank-line paragraphs, then lines, for text that isn't made of ID records.
+        """
+        separator = "\n\n" if "\n\nID: " in messages else "\n"
+        records = [r for r in _RECORD_START_RE.split(messages) if r.strip()]
+        if len(records) > 1 or messages.lstrip().startswith("ID: "):
+            return [r.strip("\n") for r in records], separator
+        paragraphs = [p for p in messages.split("\n\n") if p.strip()]
+        if len(paragraphs) > 1:
+            return paragraphs, "\n\n"
+        return [l for l in messages.split("\n") if l.strip()], "\n"
+
+    def _split_oversized_record(self, record, token_budget):
+        """Splits a single record that doesn't fit any chunk on its own into word-based pieces."""
+        words = record.split()
+        tokens_per_word = self._count_tokens(record) / max(len(words), 1)
+        words_per_piece = max(1, int(token_budget / max(tokens_per_word, 1e-9)))
+        return [" ".join(words[i:i + words_per_piece]) for i in range(0, len(words), words_per_piece)]
+
+    def handle_length(self, prompt, messages="", overlap_messages=1):
         """
         Ensure that the combined size of `messages` + `prompt` never exceeds
         85 % of the model context window. When it does, split `messages` into
-        successive chunks with overlap.
+        chunks of whole message records, packed in order into as few chunks as
+        the budget allows, each repeating the last `overlap_messages` records of
+        the previous chunk.
         Returns a list of (messages_chunk, prompt) pairs.
         """
         # Hard limit per request (85 % of the full context window)
@@ -62,88 +242,58 @@ class ModelClient:
                 f"the 85 % context-window budget of {max_ctx} tokens."
             )
 
-        words = messages.split()
-        total_message_words = len(words)
-        # Estimate token budget per chunk based on *average* word count per chunk needed
-        # This is rough, as prompt is constant but word count varies.
-        num_chunks_needed = (self._count_tokens(messages) + prompt_tokens + max_ctx -1) // max_ctx # Ceiling division
-        
-        if num_chunks_needed <= 1:
+        token_budget = max_ctx - prompt_tokens
+        records, separator = self._split_records(messages)
+        # Per-record counts come from the TokenCounter cache, so planning is O(records)
+        # (+1 per record for the separator)
+        record_tokens = [self._count_tokens(r) + 1 for r in records]
+        if sum(record_tokens) <= token_budget:
             # No splitting needed, return the original message
-             if prompt_tokens + self._count_tokens(messages) <= max_ctx:
-                  return [(messages, prompt)]
-             else:
-                  # This case should ideally not happen if prompt_tokens < max_ctx, but as safeguard:
-                  print("Warning: Message likely too large even for a single chunk. Truncating.")
-                  token_budget = max_ctx - prompt_tokens
-                  truncated_message = " ".join(words[:token_budget]) # Simple truncation by word count
-                  return [(truncated_message, prompt)]
-
-        # Calculate token budget per chunk, accounting for overlap slightly
-        # Reduce budget slightly to make room for potential overlap additions
-        # This is still an approximation.
-        token_budget = max_ctx - prompt_tokens - overlap_words 
-        if token_budget <= 0:
-             raise ValueError("Prompt and overlap requirement exceed context limit.")
-
-        chunks_data = [] # Store tuples of (start_word_index, end_word_index)
-        current_word_index = 0
-        last_chunk_end_index = 0
-
-        while current_word_index < total_message_words:
-            start_index = current_word_index
-            # Estimate end index based on token budget
-            # This is approximate because we count words not exact tokens
-            estimated_end_index = min(start_index + token_budget, total_message_words)
-            
-            # Refine end index by actually counting tokens (if a precise tokenizer were available)
-            # For now, we stick to the word count approximation
-            actual_end_index = estimated_end_index 
-            
-            # Ensure we don't create empty chunks
-            if start_index >= actual_end_index:
-                # This might happen if token budget is extremely small; advance minimally
-                 actual_end_index = min(start_index + 1, total_message_words)
-            
-            chunks_data.append((start_index, actual_end_index))
-            last_chunk_end_index = actual_end_index
-            current_word_index = actual_end_index
-            
-            # Break if we somehow overshoot (safety)
-            if current_word_index >= total_message_words: 
-                break
-
-        # Construct final chunks with overlap
-        final_chunks = []
-        for i, (start, end) in enumerate(chunks_data):
-            actual_start = start
-            if i > 0 and overlap_words > 0:
-                # Prepend overlap from the *previous* chunk's original words
-                prev_chunk_start, prev_chunk_end = chunks_data[i-1]
-                overlap_start_index = max(prev_chunk_start, prev_chunk_end - overlap_words)
-                # Use words from the original list to get overlap
-                overlap_words_list = words[overlap_start_index:prev_chunk_end]
-                current_chunk_words = words[start:end]
-                chunk_text = " ".join(overlap_words_list + current_chunk_words)
-                # Recalculate tokens and truncate if overlap made it too long
-                current_tokens = self._count_tokens(chunk_text)
-                if prompt_tokens + current_tokens > max_ctx:
-                    excess_tokens = (prompt_tokens + current_tokens) - max_ctx
-                    # Truncate from the *end* of the combined chunk words
-                    combined_words = overlap_words_list + current_chunk_words
-                    chunk_text = " ".join(combined_words[:-excess_tokens]) # Remove words from end
+            return [(messages, prompt)]
+
+        # Records that can't fit a chunk by themselves are split into pieces first
+        planned_records, planned_tokens = [], []
+        for record, tokens in zip(records, record_tokens):
+            if tokens > token_budget:
+                print(f"Warning: Message record of ~{tokens} tokens exceeds the chunk budget, splitting it.")
+                for piece in self._split_oversized_record(record, token_budget // 2):
+                    planned_records.append(piece)
+                    planned_tokens.append(self._count_tokens(piece) + 1)
             else:
-                # First chunk or no overlap
-                chunk_text = " ".join(words[start:end])
+                planned_records.append(record)
+                planned_tokens.append(tokens)
 
-            final_chunks.append((chunk_text, prompt))
+        # Greedy in-order packing: the fewest chunks possible without reordering the records.
+        # A new chunk starts with the overlap records of the previous one when they still fit.
+        chunks = []  # [(first_index, end_index)]
+        start = 0
+        while start < len(planned_records):
+            chunk_start = start
+            used = 0
+            if chunks and overlap_messages > 0:
+                overlap_start = max(chunks[-1][0], start - overlap_messages)
+                overlap_tokens = sum(planned_tokens[overlap_start:start])
+                if overlap_tokens + planned_tokens[start] <= token_budget // 2:
+                    chunk_start = overlap_start
+                    used = overlap_tokens
+            end = start
+            while end < len(planned_records) and used + planned_tokens[end] <= token_budget:
+                used += planned_tokens[end]
+                end += 1
+            end = max(end, start + 1)  # always make progress
+            chunks.append((chunk_start, end))
+            start = end
 
-        return final_chunks
+        print(f"Split {len(planned_records)} message records into {len(chunks)} chunks.")
+        return [(separator.join(planned_records[first:end]), prompt) for first, end in chunks]
 
-    def generate(self, prompt, messages="", json=0, history=None):
+    def generate(self, prompt, messages="", json=0, history=None, on_text=None, context_id=None):
         """
         Generate content, automatically splitting messages+prompt if needed.
         Combines multiple chunk responses into one output.
+        For free-text responses (json=0), `on_text` receives the combined output
+        piece by piece while it is being generated. `context_id` identifies the
+        context `messages` come from, for provider-side context caching.
         """
         pairs = self.handle_length(prompt, messages)
 
@@ -161,53 +311,53 @@ class ModelClient:
                 return obj
 
         if json > 0:
-            if json == 3:  # Project creation
-                combined_projects = []
-                all_history = []
-                current_history = history
-                for msg_chunk, prmpt in pairs:
-                    if self.mode == "gemini":
-                        resp_text, new_history = self.generate_with_gemini(prmpt, msg_chunk, json=json, history=current_history)
-                        # Update history for next chunk if needed
-                        if len(pairs) > 1:
-                            current_history = new_history
-                    else:
-                        print("Implement mode", self.mode)
-                        raise ValueError("Invalid mode")
-
-                    data = _json.loads(resp_text)
-                    combined_projects.extend(data.get("projects", []))
-                    if new_history:
-                        all_history = make_serializable(new_history)
-                combined = {"projects": combined_projects}
-                return _json.dumps(combined), all_history
-            else:  # Other JSON responses (messages)
-                combined_messages = []
-                all_history = []
-                current_history = history
-                for msg_chunk, prmpt in pairs:
-                    if self.mode == "gemini":
-                        resp_text, new_history = self.generate_with_gemini(prmpt, msg_chunk, json=json, history=current_history)
-                        # Update history for next chunk if needed
-                        if len(pairs) > 1:
-                            current_history = new_history
-                    else:
-                        print("Implement mode", self.mode)
-                        raise ValueError("Invalid mode")
-
-                    data = _json.loads(resp_text)
-                    combined_messages.extend(data.get("messages", []))
-                    if new_history:
-                        all_history = make_serializable(new_history)
-                combined = {"messages": combined_messages}
-                return _json.dumps(combined), all_history
+            # JSON modes: chunks are independent, so they run concurrently, each with the
+            # caller's history, and their arrays are merged in chunk order
+            if self.mode not in self.SUPPORTED_MODES:
+                print("Implement mode", self.mode)
+                raise ValueError("Invalid mode")
+            list_key = "projects" if json == 3 else "messages"  # 3 = project creation
+
+            def run_chunk(idx, pair):
+                msg_chunk, prmpt = pair
+                chunk_history = list(history) if history else None
+                chunk_context_id = f"{context_id}#{idx}" if context_id else None
+                return self.generate_with_gemini(prmpt, msg_chunk, json=json, history=chunk_history, context_id=chunk_context_id)
+
+            if len(pairs) > 1 and self.max_concurrency > 1:
+                print(f"Running {len(pairs)} chunks with up to {self.max_concurrency} concurrent requests.")
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pairs))) as executor:
+                    results = list(executor.map(run_chunk, range(len(pairs)), pairs))  # map keeps chunk order
+            else:
+                results = [run_chunk(idx, pair) for idx, pair in enumerate(pairs)]
+
+            combined_items = []
+            seen_keys = set()
+            all_history = []
+            for resp_text, new_history in results:
+                data = _json.loads(resp_text)
+                for item in data.get(list_key, []):
+                    # Overlapping chunks can return the same message/project twice, keep the first
+                    key = self._merge_key(json, item)
+                    if key is not None:
+                        if key in seen_keys:
+                            continue
+                        seen_keys.add(key)
+                    combined_items.append(item)
+                if new_history:
+                    all_history = make_serializable(new_history)
+            combined = {list_key: combined_items}
+            return _json.dumps(combined), all_history
         else:
             responses = []
             all_history = []
             current_history = history
             for idx, (msg_chunk, prmpt) in enumerate(pairs, start=1):
-                if self.mode == "gemini":
-                    resp_text, new_history = self.generate_with_gemini(prmpt, msg_chunk, json=0, history=current_history)
+                if on_text and len(pairs) > 1:
+                    on_text(("\n\n" if idx > 1 else "") + f"--- Response {idx} ---\n")
+                if self.mode in self.SUPPORTED_MODES:
+                    resp_text, new_history = self.generate_with_gemini(prmpt, msg_chunk, json=0, history=current_history, on_text=on_text,
+                                                                       context_id=f"{context_id}#{idx}" if context_id else None)
                     # Update history for next chunk if needed
                     if len(pairs) > 1:
                         current_history = new_history
@@ -224,10 +374,227 @@ class ModelClient:
             combined_text = "\n\n".join(responses)
             return combined_text, all_history
 
-    def generate_with_gemini(self, prompt, messages, json=0, history=None):
-        # Initialize history if not provided
-        if history is None:
-            history = []
+    @staticmethod
+    def _merge_key(json, item):
+        """Identity of an item in a JSON-mode response, used to drop duplicates across chunks."""
+        if not isinstance(item, dict):
+            return None
+        if json == 3:
+            name = item.get("name")
+            return " ".join(str(name).lower().split()) if name else None
+        item_id = item.get("id")
+        return str(item_id).strip() if item_id is not None else None
+
+    @staticmethod
+    def _history_fingerprint(history):
+        """Stable hash of a conversation history (SDK Content objects or their serialized dicts)."""
+        digest = hashlib.sha256()
+        for content in history or []:
+            if isinstance(content, dict):
+                digest.update(_json.dumps(content, sort_keys=True, default=str).encode("utf-8"))
+            else:
+                role = getattr(content, "role", "")
+                digest.update(str(role).encode("utf-8"))
+                for part in getattr(content, "parts", None) or []:
+                    text = getattr(part, "text", None)
+                    digest.update((text if isinstance(text, str) else repr(part)).encode("utf-8"))
+            digest.update(b"\x1e")
+        return digest.hexdigest()
+
+    def _response_cache_key(self, prompt, messages, json, history):
+        """Key of a request in the response cache: model, json mode, system prompt, history hash and context hash."""
+        context_hash = hashlib.sha256(f"{prompt}\x1f{messages}".encode("utf-8")).hexdigest()
+        key_parts = [self.model, str(json), self.SYSTEM_PROMPTS.get(json, sys_prompt_answer_question),
+                     self._history_fingerprint(history), context_hash]
+        return hashlib.sha256("\x1f".join(key_parts).encode("utf-8")).hexdigest()
+
+    def _cached_response(self, cache_key):
+        if not self.response_cache_enabled:
+            return None
+        cache_db = None
+        try:
+            cache_db = ResponseCacheDatabaseHandler(ttl_seconds=self.response_cache_ttl_seconds, max_bytes=self.response_cache_max_bytes)
+            response = cache_db.get(cache_key)
+        except Exception as e:
+            print(f"[ResponseCache] Lookup failed: {e}")
+            response = None
+        finally:
+            if cache_db: cache_db.close()
+        with self._cache_stats_lock:
+            if response is None:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+        return response
+
+    def _store_response(self, cache_key, json, response):
+        if not self.response_cache_enabled or not isinstance(response, str):
+            return
+        cache_db = None
+        try:
+            cache_db = ResponseCacheDatabaseHandler(ttl_seconds=self.response_cache_ttl_seconds, max_bytes=self.response_cache_max_bytes)
+            cache_db.put(cache_key, self.model, json, response)
+        except Exception as e:
+            print(f"[ResponseCache] Store failed: {e}")
+        finally:
+            if cache_db: cache_db.close()
+
+    def get_cache_stats(self):
+        """Hit/miss counters of this process plus the size of the on-disk response cache."""
+        with self._cache_stats_lock:
+            hits, misses = self.cache_hits, self.cache_misses
+        stats = {"enabled": self.response_cache_enabled, "hits": hits, "misses": misses,
+                 "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+        cache_db = None
+        try:
+            cache_db = ResponseCacheDatabaseHandler(ttl_seconds=self.response_cache_ttl_seconds, max_bytes=self.response_cache_max_bytes)
+            stats.update(cache_db.get_stats())
+        finally:
+            if cache_db: cache_db.close()
+        return stats
+
+    def clear_response_cache(self):
+        cache_db = None
+        try:
+            cache_db = ResponseCacheDatabaseHandler(ttl_seconds=self.response_cache_ttl_seconds, max_bytes=self.response_cache_max_bytes)
+            return cache_db.clear()
+        finally:
+            if cache_db: cache_db.close()
+
+    def _context_cache_name(self, context_id, json, messages):
+        """
+        Returns the name of the provider cached content holding `messages` (and the system prompt
+        of `json`), or None to send the context inline.
+
+        A context is uploaded the second time it is sent unchanged for the same `context_id`, so
+        contexts that differ on every call (e.g. per-prompt retrieval) never pay for an upload.
+        When the context of a `context_id` changes (its messages changed), the old cached content
+        is deleted.
+        """
+        if not self.context_cache_enabled or not context_id or not messages:
+            return None
+        if not hasattr(self.gemini_client, "caches"):
+            return None
+        if self._count_tokens(messages) < self.context_cache_min_tokens:
+            return None
+        context_hash = hashlib.sha256(messages.encode("utf-8")).hexdigest()
+        key = (context_id, json)
+        with self._context_caches_lock:
+            entry = self._context_caches.get(key)
+            if entry is None or entry['hash'] != context_hash:
+                stale_name = entry['name'] if entry else None
+                self._context_caches[key] = {'hash': context_hash, 'name': None, 'expires_at': 0, 'failed': False}
+                create = False
+            else:
+                stale_name = None
+                if entry['name'] and entry['expires_at'] > time.time():
+                    return entry['name']
+                create = not entry['failed']
+        if stale_name:
+            self._delete_cached_content(stale_name)
+        if not create:
+            return None
+
+        try:
+            cached_content = self.gemini_client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"remainder-{json}-{context_hash[:12]}",
+                    system_instruction=self.SYSTEM_PROMPTS.get(json, sys_prompt_answer_question),
+                    contents=[
+                        types.Content(
+                            role="user",
+                            parts=[
+                                types.Part.from_text(text=f"Context:\n{messages}"),
+                            ],
+                        )
+                    ],
+                    ttl=f"{int(self.context_cache_ttl_seconds)}s",
+                ),
+            )
+        except Exception as e:
+            print(f"[ContextCache] Could not cache context {context_id}: {e}")
+            with self._context_caches_lock:
+                if key in self._context_caches:
+                    self._context_caches[key]['failed'] = True
+            return None
+        print(f"[ContextCache] Uploaded context {context_id} as {cached_content.name}")
+        with self._context_caches_lock:
+            self._context_caches.setdefault(key, {'hash': context_hash, 'failed': False}).update(
+                name=cached_content.name, expires_at=time.time() + self.context_cache_ttl_seconds - 60)
+        return cached_content.name
+
+    @staticmethod
+    def _is_missing_cache_error(error):
+        """Whether `error` says the cached content of a request doesn't exist (anymore)."""
+        for attr in ("code", "status_code", "status"):
+            status = getattr(error, attr, None)
+            if isinstance(status, int) and status != 404:
+                return False
+            if status == 404 or status == "NOT_FOUND":
+                return True
+        message = str(error).lower()
+        return ("cached" in message or "cache" in message) and any(
+            phrase in message for phrase in ("not found", "expired", "does not exist", "not_found"))
+
+    def _delete_cached_content(self, name):
+        try:
+            self.gemini_client.caches.delete(name=name)
+        except Exception as e:
+            print(f"[ContextCache] Could not delete cached content {name}: {e}")
+
+    def _forget_context_cache(self, context_id, json):
+        with self._context_caches_lock:
+            entry = self._context_caches.pop((context_id, json), None)
+        if entry and entry['name']:
+            self._delete_cached_content(entry['name'])
+
+    def clear_context_caches(self):
+        """Deletes every cached content this client uploaded (e.g. on application shutdown)."""
+        with self._context_caches_lock:
+            names = [entry['name'] for entry in self._context_caches.values() if entry['name']]
+            self._context_caches = {}
+        for name in names:
+            self._delete_cached_content(name)
+
+    def _request_response(self, contents, config, request_tokens, cache_key, json, on_text):
+        """Sends one request through the scheduler, streamed when `on_text` is given. Returns (raw response, text)."""
+        if on_text and json == 0:
+            # Streamed: only the rate limit applies, a retry halfway through would repeat text
+            self.scheduler.acquire(request_tokens)
+            pieces = []
+            gemini_response = None
+            for gemini_response in self.gemini_client.models.generate_content_stream(
+                model=self.model,
+                contents=contents,
+                config=config,
+            ):
+                if gemini_response.text:
+                    pieces.append(gemini_response.text)
+                    on_text(gemini_response.text)
+            response = "".join(pieces)
+        else:
+            gemini_response = self.scheduler.call(
+                lambda: self.gemini_client.models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=config,
+                ),
+                tokens=request_tokens,
+                key=cache_key,  # identical requests in flight are sent once
+            )
+            response = gemini_response.text
+        return gemini_response, response
+
+    def generate_with_gemini(self, prompt, messages, json=0, history=None, on_text=None, context_id=None):
+        # With `on_text`, a free-text (json=0) response is streamed: on_text(text) is called
+        # with every piece as it arrives, the full text is still returned at the end.
+        # `context_id` names the context `messages` belongs to (e.g. a project), which lets a
+        # context that is sent again unchanged be served from the provider's context cache.
+        # Initialize history if not provided; copied, the context turn appended below must
+        # not leak into the caller's (cached) history
+        history = list(history) if history else []
+        cache_key = self._response_cache_key(prompt, messages, json, history)
         
         # Create a new history list for this conversation
         conversation_history = []
@@ -246,12 +613,30 @@ class ModelClient:
             )
         )
 
-        # Append the prompt
+        cached_response = self._cached_response(cache_key)
+        if cached_response is not None:
+            print(f"Response cache hit for prompt: {prompt[:80]}")
+            if on_text:
+                on_text(cached_response)
+            conversation_history.append(
+                types.Content(
+                    role="model",
+                    parts=[
+                        types.Part.from_text(text=cached_response),
+                    ],
+                ),
+            )
+            return cached_response, conversation_history
+
+        # Append the prompt, with the context unless it is already uploaded as cached content
+        prior_history = list(history)
+        context_cache_name = self._context_cache_name(context_id, json, messages)
+        request_text = prompt if context_cache_name else f"{prompt}\nContext:\n{messages}"
         history.append(
             types.Content(
                 role="user",
                 parts=[
-                    types.Part.from_text(text=f"{prompt}\nContext:\n{messages}"),
+                    types.Part.from_text(text=request_text),
                 ],
             )
         )
@@ -393,12 +778,42 @@ class ModelClient:
                 ],
             )
 
+        if context_cache_name:
+            # The system prompt and the context live in the cached content
+            generate_content_config.system_instruction = None
+            generate_content_config.cached_content = context_cache_name
+
         # prompt model
-        response = self.gemini_client.models.generate_content(
-            model=self.model,
-            contents=history,
-            config=generate_content_config,
-        ).text
+        request_tokens = self._count_tokens(request_text)
+        delivered = []  # whether any streamed piece already reached on_text
+        request_on_text = on_text
+        if on_text and context_cache_name:
+            def request_on_text(text):
+                delivered.append(True)
+                on_text(text)
+        try:
+            gemini_response, response = self._request_response(history, generate_content_config, request_tokens, cache_key, json, request_on_text)
+        except Exception as e:
+            # Only a cached content that is gone (expired or deleted on the provider side) is
+            # retried inline, and only before any text was streamed, a retry would repeat it
+            if not context_cache_name or delivered or not self._is_missing_cache_error(e):
+                raise
+            print(f"[ContextCache] Cached context of {context_id} is gone ({e}), retrying without it.")
+            self._forget_context_cache(context_id, json)
+            return self.generate_with_gemini(prompt, messages, json=json, history=prior_history, on_text=on_text)
+
+        # Calibrate the token estimator with the prompt size Gemini actually counted
+        # (not with cached content, whose tokens are counted but weren't sent)
+        usage = getattr(gemini_response, "usage_metadata", None)
+        prompt_token_count = getattr(usage, "prompt_token_count", None)
+        if isinstance(prompt_token_count, int) and not context_cache_name:
+            sent_chars = sum(len(part.text) for content in history for part in (getattr(content, "parts", None) or [])
+                             if isinstance(getattr(part, "text", None), str))
+            sent_chars += sum(len(part.text) for part in (generate_content_config.system_instruction or [])
+                              if isinstance(getattr(part, "text", None), str))
+            self.token_counter.calibrate(sent_chars, prompt_token_count)
+
+        self._store_response(cache_key, json, response)
 
         # add response to history
         conversation_history.append(
@@ -412,7 +827,7 @@ class ModelClient:
 
         return response, conversation_history
 
-    def select_messages(self, user_text, project=None, use_history=False, history=None, context_string=None):
+    def select_messages(self, user_text, project=None, use_history=False, history=None, context_string=None, context_id=None):
         """
         Implements the logic for selecting related messages to a user query, as in the original widget_model_chat.py.
         Returns (response, history)
@@ -440,7 +855,7 @@ class ModelClient:
             hist = history
         else:
             hist = None
-        response, new_history = self.generate(prompt=user_text, messages=cleared_messages_str, json=1, history=hist)
+        response, new_history = self.generate(prompt=user_text, messages=cleared_messages_str, json=1, history=hist, context_id=context_id)
         return response, new_history
 
     def generic_chat(self, user_text, project=None, use_history=False, history=None):
@@ -464,99 +879,271 @@ class ModelClient:
         response, new_history = self.generate(prompt=user_text, messages=cleared_messages_str, history=hist)
         return response, new_history
 
-    def process_all_main_chat_messages(self, check_for_new_projects=False, max_batch_size=20):
+    def process_all_main_chat_messages(self, check_for_new_projects=False, max_batch_size=50, job=None,
+                                       batch_token_budget=4000, max_concurrent_batches=None,
+                                       message_db_name=None, projects_db_name=None):
         """
         Processes all unprocessed messages in the main chat, optionally first checking for new projects.
         Implements the logic from widget_model_chat.py's process_all_main_chat_messages.
+
+        Messages are batched by token count (`batch_token_budget` tokens of message records, at
+        most `max_batch_size` messages per batch) and up to `max_concurrent_batches` batches
+        (default: max_concurrency) are sent to the model at the same time; each batch's
+        results are written in one transaction.
+
+        With a `job` (Utils.job_runner.Job), progress is reported per batch, a cancel request
+        stops the run before the next batch starts, and a failing batch is recorded on the job
+        instead of aborting the run (its messages stay unprocessed for the next run).
+
+        Runs are journaled in messages.db: a run that was interrupted (crash, cancel, error) is
+        resumed by the next call, skipping its applied batches and applying the model responses
+        it had already received without asking the model again.
+        `message_db_name` / `projects_db_name` point it at other databases (e.g. a benchmark's).
+        Returns {'batches', 'failed_batches', 'messages', 'elapsed_seconds', 'messages_per_minute', 'run_id'}.
         """
         from DatabaseUtils.database_messages import MessageDatabaseHandler
         from DatabaseUtils.database_projects import ProjectsDatabaseHandler
         from datetime import datetime
-        message_db = MessageDatabaseHandler()
-        projects_db = ProjectsDatabaseHandler()
-        if check_for_new_projects:
-            self.check_for_new_projects(message_db, projects_db)
-        unprocessed = message_db.get_project_messages(project_name=None, only_unprocessed=True)
-        if not unprocessed:
-            print("No unprocessed messages found.")
-            return
+        started_at = time.perf_counter()
+        message_db = MessageDatabaseHandler(db_name=message_db_name)
+        projects_db = ProjectsDatabaseHandler(db_name=projects_db_name)
+        try:
+            if check_for_new_projects:
+                self.check_for_new_projects(message_db, projects_db)
+                if job:
+                    job.check_cancelled()
+            unprocessed = message_db.get_project_messages(project_name=None, only_unprocessed=True)
+            unfinished_run = message_db.get_unfinished_processing_run()
+            if not unprocessed:
+                print("No unprocessed messages found.")
+                if unfinished_run:
+                    message_db.finish_processing_run(unfinished_run['run_id'])
+                if job:
+                    job.set_batches([])
+                return {'batches': 0, 'failed_batches': 0, 'messages': 0, 'elapsed_seconds': 0.0, 'messages_per_minute': 0.0, 'run_id': None}
+            projects_prompt = self._build_projects_prompt(message_db, projects_db)
+            unassigned = [msg for msg in unprocessed if msg['project'] == "" or msg['project'] is None]
+
+            # (journal batch index, messages, model response already received or None)
+            work = []
+            if unfinished_run:
+                run_id = unfinished_run['run_id']
+                unassigned_by_id = {msg['id']: msg for msg in unassigned}
+                journaled_ids = set()
+                applied = 0
+                for entry in unfinished_run['batches']:
+                    journaled_ids.update(entry['message_ids'])
+                    if entry['status'] == 'applied':
+                        applied += 1
+                        continue
+                    # Messages processed or deleted since are left out
+                    batch = [unassigned_by_id[msg_id] for msg_id in entry['message_ids'] if msg_id in unassigned_by_id]
+                    if batch:
+                        # A batch that failed after its response arrived keeps the response
+                        work.append((entry['batch_index'], batch, entry['response']))
+                new_batches = self._plan_message_batches([msg for msg in unassigned if msg['id'] not in journaled_ids],
+                                                         batch_token_budget, max_batch_size)
+                if new_batches:
+                    indexes = message_db.add_processing_batches(run_id, [[msg['id'] for msg in batch] for batch in new_batches])
+                    work.extend((idx, batch, None) for idx, batch in zip(indexes, new_batches))
+                print(f"Resuming processing run {run_id}: {applied} batches already applied, "
+                      f"{sum(1 for _, _, response in work if response is not None)} answered batches to apply without the model.")
+            else:
+                batches = self._plan_message_batches(unassigned, batch_token_budget, max_batch_size)
+                run_id = message_db.start_processing_run([[msg['id'] for msg in batch] for batch in batches])
+                work = [(idx, batch, None) for idx, batch in enumerate(batches)]
+            batches = [batch for _, batch, _ in work]
+            if job:
+                job.set_batches([len(batch) for batch in batches])
+
+            def run_batch(idx):
+                batch_index, batch, response = work[idx]
+                if job and job.cancelled:
+                    return None
+                if job:
+                    job.batch_started(idx)
+                # Own handler per worker; connections come from the pool, writes go through the writer thread
+                batch_db = MessageDatabaseHandler(db_name=message_db.db_name)
+                try:
+                    if response is None:
+                        response = self._request_batch_assignment(batch, projects_prompt)
+                        batch_db.record_batch_response(run_id, batch_index, response)
+                    self._apply_batch_response(batch, response, batch_db, run_id=run_id, batch_index=batch_index)
+                except Exception as e:
+                    try:
+                        batch_db.record_batch_failure(run_id, batch_index, str(e))
+                    except Exception as journal_error:
+                        print(f"Error journaling failed batch {batch_index}: {journal_error}")
+                    if not job:
+                        raise
+                    print(f"Error processing batch {batch_index}: {e}")
+                    job.batch_finished(idx, error=str(e))
+                    return False
+                finally:
+                    batch_db.close()
+                if job:
+                    job.batch_finished(idx)
+                return True
+
+            concurrency = max(1, min(max_concurrent_batches or self.max_concurrency, len(batches)))
+            print(f"Processing {len(unassigned)} messages in {len(batches)} batches, up to {concurrency} at a time.")
+            if concurrency > 1:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    outcomes = list(executor.map(run_batch, range(len(batches))))
+            else:
+                outcomes = [run_batch(idx) for idx in range(len(batches))]
+
+            batch_count = sum(1 for outcome in outcomes if outcome)
+            failed_count = sum(1 for outcome in outcomes if outcome is False)
+            processed_messages = sum(len(batch) for batch, outcome in zip(batches, outcomes) if outcome)
+            elapsed = time.perf_counter() - started_at
+            messages_per_minute = processed_messages * 60.0 / elapsed if elapsed > 0 else 0.0
+            print(f"Processed {processed_messages} messages in {batch_count} batches in {elapsed:.1f}s "
+                  f"({messages_per_minute:.0f} messages/minute, {failed_count} batches failed).")
+            if job and any(outcome is None for outcome in outcomes):
+                job.check_cancelled()  # batches were skipped, the run stays open to be resumed
+            # Every batch was attempted; messages of failed batches are still unprocessed and get a new run
+            message_db.finish_processing_run(run_id)
+            return {'batches': batch_count, 'failed_batches': failed_count, 'messages': processed_messages,
+                    'elapsed_seconds': round(elapsed, 2), 'messages_per_minute': round(messages_per_minute, 1), 'run_id': run_id}
+        finally:
+            projects_db.close()
+            message_db.close()
+
+    def _build_projects_prompt(self, message_db, projects_db):
+        """
+        Returns the projects context of the assignment and discovery prompts: per project its
+        name, description and first 5 messages. Each project's part is kept as a digest in
+        projects.db and only rebuilt when that project's messages (per the messages.db change
+        counters) or its description changed, so this is usually two cheap reads.
+        """
         projects = projects_db.get_all_projects()
+        digests = projects_db.get_project_digests()
+        versions = message_db.get_change_versions()
+        refreshed = {}
         project_contexts = []
         for project in projects:
             project_name = project['name']
-            project_desc = project.get('description', '')
-            messages = message_db.get_project_messages(project_name=project_name)
-            first_5 = messages[:5]
-            first_5_str = "\n".join([f"{m['content']}" for m in first_5])
-            project_contexts.append(f"Project: {project_name}\nDescription: {project_desc}\nFirst 5 Messages Of Project:\n{first_5_str}")
-        projects_prompt = "\n\n".join(project_contexts)
+            project_desc = project.get('description', '') or ''
+            source_version = versions.get(f"project:{project_name}", 0)
+            digest = digests.get(project_name)
+            if digest is None or digest['source_version'] != source_version or digest['description'] != project_desc:
+                first_5 = message_db.get_project_messages(project_name=project_name, limit=5)
+                first_5_str = "\n".join([f"{m['content']}" for m in first_5])
+                text = f"Project: {project_name}\nDescription: {project_desc}\nFirst 5 Messages Of Project:\n{first_5_str}"
+                digest = {'description': project_desc, 'digest': text, 'token_count': self._count_tokens(text), 'source_version': source_version}
+                refreshed[project_name] = digest
+            project_contexts.append(digest['digest'])
+        if refreshed or len(digests) != len(projects):
+            print(f"Refreshed {len(refreshed)} of {len(projects)} project digests.")
+            projects_db.save_project_digests(refreshed, keep_names={project['name'] for project in projects})
+        return "\n\n".join(project_contexts)
+
+    def _plan_message_batches(self, messages, token_budget, max_batch_size):
+        """
+        Splits messages into consecutive batches of at most `token_budget` tokens of message
+        records and at most `max_batch_size` messages. A message over the budget gets a batch
+        of its own.
+        """
+        batches = []
         batch = []
-        batch_count = 0
-        for msg in unprocessed:
-            if msg['project'] == "" or msg['project'] is None:
-                batch.append(msg)
-                if len(batch) == max_batch_size:
-                    self._process_message_batch(batch, projects_prompt, message_db)
-                    batch_count += 1
-                    batch = []
+        batch_tokens = 0
+        for msg in messages:
+            msg_tokens = self._count_tokens(self._format_batch_message(msg)) + 1
+            if batch and (batch_tokens + msg_tokens > token_budget or len(batch) >= max_batch_size):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(msg)
+            batch_tokens += msg_tokens
         if batch:
-            self._process_message_batch(batch, projects_prompt, message_db)
-            batch_count += 1
-        print(f"Processed {batch_count} batches of messages.")
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _format_batch_message(msg):
+        return f"ID: {msg['id']}, Timestamp: {msg.get('timestamp', 'Unknown Timestamp')}, Content: {msg['content']}"
 
     def check_for_new_projects(self, message_db, projects_db):
         """
         Checks for new projects based on unassigned messages, as in widget_model_chat.py.
+
+        Incremental: only unassigned messages added since the last check (projects.db keeps the
+        highest message id already considered) are sent, with a compact name/description list
+        of the existing projects. Suggested projects matching an existing or another suggested
+        name (see _find_similar_project_name) are not created.
         """
         from datetime import datetime
+        last_message_id = projects_db.get_discovery_mark()
         unprocessed = message_db.get_project_messages(project_name=None, only_unprocessed=True)
-        if not unprocessed:
-            print("No unprocessed messages for project check.")
+        new_messages = [msg for msg in unprocessed
+                        if (msg['project'] == "" or msg['project'] is None) and msg['id'] > last_message_id]
+        if not new_messages:
+            print(f"No new unassigned messages since message {last_message_id} for project check.")
             return
         projects = projects_db.get_all_projects()
-        project_contexts = []
-        for project in projects:
-            project_name = project['name']
-            project_desc = project.get('description', '')
-            messages = message_db.get_project_messages(project_name=project_name)
-            first_5 = messages[:5]
-            first_5_str = "\n".join([f"{m['content']}" for m in first_5])
-            project_contexts.append(f"Project: {project_name}\nDescription: {project_desc}\nFirst 5 Messages Of Project:\n{first_5_str}")
-        projects_prompt = "\n\n".join(project_contexts)
-        cleared_messages_str = "\n".join([f"ID: {msg['id']}, Content: {msg['content']}" for msg in unprocessed if msg['project'] == "" or msg['project'] is None])
-        prompt = f"Already existing projects and some messages in them:\n{projects_prompt}\n\nMessages with no project yet:\n{cleared_messages_str}"
-        print("Checking for new projects with prompt:", prompt)
+        projects_summary = "\n".join(f"- {project['name']}: {project.get('description', '') or ''}" for project in projects)
+        cleared_messages_str = "\n".join([f"ID: {msg['id']}, Content: {msg['content']}" for msg in new_messages])
+        prompt = f"Already existing projects:\n{projects_summary or '(none)'}\n\nThe messages with no project yet are given as context."
+        print(f"Checking {len(new_messages)} new messages for new projects with prompt:", prompt)
         response, _ = self.generate(prompt=prompt, messages=cleared_messages_str, json=3, history=None)
         print("Project check response:", response)
         try:
             import json
             response_data = json.loads(response)
-            if "projects" in response_data:
-                for project in response_data["projects"]:
-                    if "name" in project and "description" in project:
-                        projects_db.add_project(project["name"], datetime.now(), project["description"], user_created=0)
+            if not isinstance(response_data, dict) or not isinstance(response_data.get("projects", []), list):
+                raise ValueError("expected an object with a 'projects' list")
         except Exception as e:
+            # The mark is not advanced, these messages are checked again next time
             print(f"Error parsing response or creating new projects: {e}")
+            return
+        known_names = [project['name'] for project in projects]
+        for project in response_data.get("projects", []):
+            if not isinstance(project, dict) or "name" not in project or "description" not in project:
+                continue
+            similar = self._find_similar_project_name(project["name"], known_names)
+            if similar is not None:
+                print(f"Skipping suggested project '{project['name']}', similar to existing '{similar}'.")
+                continue
+            projects_db.add_project(project["name"], datetime.now(), project["description"], user_created=0)
+            known_names.append(project["name"])
+        # Only advanced once the answer was handled, a failed check is retried with the same messages
+        projects_db.set_discovery_mark(max(msg['id'] for msg in new_messages))
+
+    @staticmethod
+    def _normalize_project_name(name):
+        # "My-Project!", "my project" and "MY  PROJECT" all become "my project"
+        return " ".join(re.sub(r"[^\w]+", " ", name.casefold()).split())
+
+    @classmethod
+    def _find_similar_project_name(cls, name, names, threshold=0.85):
+        """Returns the first of `names` matching `name` after normalization or by fuzzy similarity, else None."""
+        from difflib import SequenceMatcher
+        normalized = cls._normalize_project_name(name)
+        for other in names:
+            other_normalized = cls._normalize_project_name(other)
+            if normalized == other_normalized:
+                return other
+            # "Trip 2024" and "Trip 2025" are different projects however similar the text
+            if re.findall(r"\d+", normalized) != re.findall(r"\d+", other_normalized):
+                continue
+            if SequenceMatcher(None, normalized, other_normalized).ratio() >= threshold:
+                return other
+        return None
 
     def _process_message_batch(self, batch, projects_prompt, message_db):
         """
         Processes a batch of messages, assigning them to projects and extracting reminders, as in widget_model_chat.py.
         Includes message timestamps and current time in the prompt.
         """
+        response = self._request_batch_assignment(batch, projects_prompt)
+        return self._apply_batch_response(batch, response, message_db)
+
+    def _request_batch_assignment(self, batch, projects_prompt):
+        """Asks the model for the project/reminder assignment of a batch of messages. Returns the raw JSON response."""
         from datetime import datetime
         # Format messages to include timestamps
-        cleared_messages_str_list = []
-        for msg in batch:
-            # Basic check for timestamp existence and format
-            ts_str = msg.get('timestamp', 'Unknown Timestamp')
-            try:
-                # Attempt to parse for potential re-formatting or just keep original
-                # parsed_ts = datetime.fromisoformat(ts_str)
-                # formatted_ts = parsed_ts.strftime("%Y-%m-%d %H:%M") # Example format
-                formatted_ts = ts_str # Keep original for now
-            except (ValueError, TypeError):
-                formatted_ts = ts_str # Keep original if parsing fails
-            cleared_messages_str_list.append(f"ID: {msg['id']}, Timestamp: {formatted_ts}, Content: {msg['content']}")
+        cleared_messages_str_list = [self._format_batch_message(msg) for msg in batch]
         
         cleared_messages_str = "\n".join(cleared_messages_str_list)
         
@@ -576,6 +1163,13 @@ class ModelClient:
         # Let's pass the timestamped string to `messages` as well for consistency in splitting.
         response, _ = self.generate(prompt=prompt, messages=cleared_messages_str, json=2, history=None)
         print("Response:", response)
+        return response
+
+    def _apply_batch_response(self, batch, response, message_db, run_id=None, batch_index=None):
+        """
+        Writes a batch assignment response to the messages in one transaction (marking the
+        journaled batch `run_id`/`batch_index` applied, if given). Returns the number of rows updated.
+        """
         try:
             import json
             response_data = json.loads(response)
@@ -584,6 +1178,7 @@ class ModelClient:
         except Exception as e:
             print(f"Error parsing response JSON: {e}")
             response_by_id = {}
+        updates = []
         for msg in batch:
             msg_id_str = str(msg["id"])
             if msg_id_str in response_by_id:
@@ -595,10 +1190,12 @@ class ModelClient:
                 reoccurence_json = _json.dumps(reoccurence_data) if reoccurence_data else None
 
                 print(f"Message ID: {msg_id_str}, Project: {new_project}, Reminder: {remind}, Importance: {importance}, Reoccurence: {reoccurence_json}")
-                message_db.update_message(msg["id"], processed=True, project=new_project, remind=remind, importance=importance, reoccurences=reoccurence_json)
+                updates.append({'id': msg["id"], 'project': new_project, 'remind': remind, 'importance': importance, 'reoccurences': reoccurence_json})
             else:
                 print(f"Message ID: {msg_id_str} not processed by model, marking done.")
-                message_db.update_message(msg["id"], processed=True)
+                updates.append({'id': msg["id"]})
+        # One transaction for the whole batch
+        return message_db.update_processed_messages(updates, run_id=run_id, batch_index=batch_index)
 
 if __name__ == "__main__":
     None
\ No newline at end of file
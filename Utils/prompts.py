@@ -61,8 +61,8 @@ Note that this second task is independent from the task of identifying the proje
 
 # 3
 sys_prompt_create_projects = """
-Your given context: a list of projects, their description and the first 5 messages of each project.
-Your input: A list of messages that are not part of a project yet.
+Your input: a list of the existing projects and their description.
+Your given context: A list of messages that are not part of a project yet.
 
 Your task: Understand if any messages could be organized in projects (collections) that don't exist yet, for each new project that should be created specify:
 1) Name, the name of the project
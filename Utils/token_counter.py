@@ -0,0 +1,87 @@
+import math
+import threading
+from collections import OrderedDict
+
+try:
+    # Offline Gemini tokenizer, only shipped with recent google-genai releases (needs sentencepiece)
+    from google.genai.local_tokenizer import LocalTokenizer
+except Exception:
+    LocalTokenizer = None
+
+
+class TokenCounter:
+    """
+    Counts tokens for the model context budget.
+
+    Uses the exact local Gemini tokenizer when the installed SDK provides one for the model,
+    otherwise estimates from the text length with a chars-per-token ratio that calibrate()
+    keeps adjusting to the prompt token counts Gemini reports back. Counts are cached per
+    text, so the same message record is only ever counted once while it is unchanged.
+    """
+    DEFAULT_CHARS_PER_TOKEN = 4.0  # Gemini's documented average for English text
+    MIN_CHARS_PER_TOKEN = 1.5      # code, URLs, IDs and non-latin scripts tokenize much denser
+    MAX_CHARS_PER_TOKEN = 6.0
+    CALIBRATION_WEIGHT = 0.2       # weight of each new observation in the running ratio
+    MAX_CACHED_TEXT_LENGTH = 20000 # whole context strings aren't worth keeping alive in the cache
+
+    def __init__(self, model=None, cache_size=50000):
+        self.cache_size = cache_size
+        self.chars_per_token = self.DEFAULT_CHARS_PER_TOKEN
+        self._cache = OrderedDict()  # {text: token count}, least recently used first
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        if LocalTokenizer is not None and model:
+            try:
+                self._tokenizer = LocalTokenizer(model_name=model)
+            except Exception as e:
+                print(f"[TokenCounter] No local tokenizer for {model}, estimating instead: {e}")
+
+    @property
+    def exact(self):
+        return self._tokenizer is not None
+
+    def _estimate(self, text):
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def _count_uncached(self, text):
+        if self._tokenizer is not None:
+            try:
+                return self._tokenizer.count_tokens(text).total_tokens
+            except Exception as e:
+                print(f"[TokenCounter] Local tokenizer failed, estimating instead: {e}")
+                self._tokenizer = None
+        return self._estimate(text)
+
+    def count(self, text):
+        """Returns the (cached) token count of `text`."""
+        if not text:
+            return 0
+        with self._lock:
+            tokens = self._cache.get(text)
+            if tokens is not None:
+                self._cache.move_to_end(text)
+                return tokens
+        tokens = self._count_uncached(text)
+        if len(text) > self.MAX_CACHED_TEXT_LENGTH:
+            return tokens
+        with self._lock:
+            self._cache[text] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def calibrate(self, char_count, token_count):
+        """
+        Feeds back the real token count of a request of `char_count` characters (e.g. Gemini's
+        usage_metadata.prompt_token_count). Only affects the estimator; cached counts are dropped
+        so they get re-estimated with the new ratio.
+        """
+        if self._tokenizer is not None or not char_count or not token_count:
+            return
+        observed = char_count / token_count
+        ratio = (1 - self.CALIBRATION_WEIGHT) * self.chars_per_token + self.CALIBRATION_WEIGHT * observed
+        ratio = min(self.MAX_CHARS_PER_TOKEN, max(self.MIN_CHARS_PER_TOKEN, ratio))
+        if abs(ratio - self.chars_per_token) / self.chars_per_token > 0.05:
+            with self._lock:
+                self._cache.clear()
+        self.chars_per_token = ratio
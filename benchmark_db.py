@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the database layer.
+
+Measures the per-call latency of what Api.get_all_messages does on a cache miss
+(load every message of the main chat plus its images) against a throwaway database,
+comparing the legacy "fresh connection + CREATE TABLE per handler" behaviour with
+the pooled handlers (which also attach images with a single query).
+
+Usage:
+    python benchmark_db.py [--messages 2000] [--images-every 10] [--calls 50]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from DatabaseUtils.connection_pool import ConnectionPool
+from DatabaseUtils.database_messages import MessageDatabaseHandler
+from DatabaseUtils.database_writer import DatabaseWriter
+
+
+def populate(db_path, n_messages, images_every):
+    """Fills a fresh messages database with synthetic rows."""
+    db = MessageDatabaseHandler(db_name=db_path)
+    start = datetime(2025, 1, 1)
+    for i in range(n_messages):
+        message_id = db.add_message({
+            'content': f"Benchmark message {i} about project {i % 7}",
+            'timestamp': (start + timedelta(minutes=i)).isoformat(),
+            'project': f"Project {i % 7}" if i % 3 else None,
+            'files': None, 'extra': None, 'processed': i % 2, 'remind': None,
+            'importance': None, 'reoccurences': None, 'done': 0
+        })
+        if images_every and i % images_every == 0:
+            db.add_message_image(message_id, f"uploads/message_images/{message_id}_img.png", datetime.now().isoformat())
+    db.close()
+
+
+def legacy_get_all_messages(db_path):
+    """Replicates the old path: open, run the schema DDL, one image query per message, close."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT NOT NULL, timestamp TEXT NOT NULL,
+            project TEXT, files TEXT, extra TEXT, processed INTEGER DEFAULT 0, remind TEXT,
+            importance TEXT, reoccurences TEXT, done INTEGER DEFAULT 0
+        )
+    """)
+    conn.commit()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS message_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, message_id INTEGER NOT NULL, file_path TEXT NOT NULL,
+            description TEXT, created_at TEXT NOT NULL,
+            FOREIGN KEY (message_id) REFERENCES messages (id) ON DELETE CASCADE
+        )
+    """)
+    conn.commit()
+    cursor.execute("SELECT id, content, timestamp, project, files, extra, processed, remind, importance, reoccurences, done FROM messages")
+    messages = [{"id": row[0], "content": row[1], "timestamp": row[2]} for row in cursor.fetchall()]
+    for msg in messages:
+        cursor.execute("SELECT id, file_path, description, created_at FROM message_images WHERE message_id = ?", (msg['id'],))
+        msg['images'] = cursor.fetchall()
+    conn.close()
+    return messages
+
+
+def pooled_get_all_messages(db_path):
+    """Same work through the pooled MessageDatabaseHandler and its bulk image fetch."""
+    db = MessageDatabaseHandler(db_name=db_path)
+    try:
+        return db.get_project_messages(project_name=None, with_images=True)
+    finally:
+        db.close()
+
+
+def time_calls(fn, db_path, calls):
+    fn(db_path)  # warm-up (page cache, pool, schema init)
+    timings = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn(db_path)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:<28} mean {statistics.mean(timings):8.3f} ms | median {statistics.median(timings):8.3f} ms | min {min(timings):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DatabaseUtils handlers.")
+    parser.add_argument("--messages", type=int, default=2000, help="Number of synthetic messages")
+    parser.add_argument("--images-every", type=int, default=10, help="Attach an image to every Nth message (0 = none)")
+    parser.add_argument("--calls", type=int, default=50, help="Timed calls per variant")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "messages_bench.db")
+        populate(db_path, args.messages, args.images_every)
+        print(f"get_all_messages over {args.messages} messages, {args.calls} calls each:")
+        report("legacy (open + DDL + N+1)", time_calls(legacy_get_all_messages, db_path, args.calls))
+        report("pooled handler", time_calls(pooled_get_all_messages, db_path, args.calls))
+        DatabaseWriter.stop_all()
+        ConnectionPool.close_all()
+
+
+if __name__ == "__main__":
+    main()
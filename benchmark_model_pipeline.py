@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Offline load test of the model pipeline.
+
+Runs ModelClient against the FakeModelClient backend (no network, no API key, fixed latency
+per request) over synthetic data, so the chunking, fan-out, batching and database updates can
+be timed without Gemini. Uses throwaway messages/projects databases and disables the response cache.
+Message processing goes through process_all_main_chat_messages, i.e. the same token-budget
+batch planner, concurrent batches and run journal as the app.
+
+Usage:
+    python benchmark_model_pipeline.py [--messages 2000] [--latency 0.2] [--context-window 20000]
+                                       [--batch-size 50] [--batch-token-budget 4000] [--concurrency 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from DatabaseUtils.connection_pool import ConnectionPool
+from DatabaseUtils.database_messages import MessageDatabaseHandler
+from DatabaseUtils.database_projects import ProjectsDatabaseHandler
+from DatabaseUtils.database_writer import DatabaseWriter
+from Utils.fake_model_client import FakeModelClient
+from Utils.model_handler import ModelClient
+
+N_PROJECTS = 5
+
+
+def populate(db, projects_db, n_messages):
+    """Fills fresh databases with synthetic projects and unprocessed synthetic messages."""
+    start = datetime(2025, 1, 1)
+    for i in range(N_PROJECTS):
+        projects_db.add_project(f"Project {i}", start.isoformat(), project_description=f"Synthetic project {i}")
+    for i in range(n_messages):
+        db.add_message({
+            'content': f"Benchmark note {i}: remember to follow up on item {i % 97} tomorrow",
+            'timestamp': (start + timedelta(minutes=i)).isoformat(),
+            'project': None, 'files': None, 'extra': None, 'processed': 0, 'remind': None,
+            'importance': None, 'reoccurences': None, 'done': 0
+        })
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    print(f"{label:<44} {(time.perf_counter() - t0) * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the model pipeline against the offline fake backend.")
+    parser.add_argument("--messages", type=int, default=2000, help="Number of synthetic messages")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per request (seconds)")
+    parser.add_argument("--context-window", type=int, default=20000, help="Model context window (small values force chunking)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Max messages per project-assignment batch")
+    parser.add_argument("--batch-token-budget", type=int, default=4000, help="Tokens of message records per batch")
+    parser.add_argument("--concurrency", type=int, default=None, help="Batches in flight at once (default: the client's max_concurrency)")
+    args = parser.parse_args()
+
+    fake_client = FakeModelClient(latency=args.latency, stream_delay=0)
+    client = ModelClient(mode="fake", model_context_window=args.context_window, response_cache=False, client=fake_client)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_name = os.path.join(tmp_dir, "messages_bench.db")
+        projects_db_name = os.path.join(tmp_dir, "projects_bench.db")
+        db = MessageDatabaseHandler(db_name=db_name)
+        projects_db = ProjectsDatabaseHandler(db_name=projects_db_name)
+        try:
+            populate(db, projects_db, args.messages)
+            messages = db.get_project_messages(project_name=None)
+            context_string = "\n\n".join(f"ID: {m['id']}, Timestamp: {m['timestamp']}, Project: None, Extra: None, Text: {m['content']}" for m in messages)
+            print(f"{args.messages} messages, {args.latency * 1000:.0f} ms fake latency, "
+                  f"{len(client.handle_length('Which notes mention item 42?', context_string))} chunks per full-context request\n")
+
+            timed("select_messages (json=1, chunk fan-out)",
+                  lambda: client.select_messages("Which notes mention item 42?", context_string=context_string))
+
+            streamed = []
+            t0 = time.perf_counter()
+            client.generate("Summarize my notes", context_string[:args.context_window], json=0,
+                            on_text=lambda text: streamed.append(time.perf_counter() - t0))
+            print(f"{'model chat stream, time to first piece':<44} {streamed[0] * 1000:10.1f} ms")
+
+            requests_before = fake_client.request_count
+            stats = timed("process all messages (planner + concurrent batches)",
+                          lambda: client.process_all_main_chat_messages(
+                              max_batch_size=args.batch_size, batch_token_budget=args.batch_token_budget,
+                              max_concurrent_batches=args.concurrency,
+                              message_db_name=db_name, projects_db_name=projects_db_name))
+            print(f"  {stats['batches']} batches ({stats['failed_batches']} failed), "
+                  f"{fake_client.request_count - requests_before} model requests, "
+                  f"{stats['messages_per_minute']:.0f} messages/minute, "
+                  f"{len(db.get_project_messages(project_name=None, only_unprocessed=True))} messages left unprocessed")
+        finally:
+            projects_db.close()
+            db.close()
+            DatabaseWriter.stop_all()
+            ConnectionPool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Checks that the hot queries on messages.db never scan the messages or message_images tables.
+
+Builds a throwaway database through MessageDatabaseHandler (so INDEX_MIGRATIONS are applied),
+runs the hot handler methods with a trace callback on the connection to capture the SQL they
+actually send, then runs EXPLAIN QUERY PLAN on each statement. The handlers are called with
+the arguments the app uses (e.g. the image worker's first slice, after_id=0). Any SCAN of a hot
+table fails the check, also "SCAN ... USING INDEX", ordered or not (walking an index is still a
+scan). The one exception is the calls in WHOLE_SUBSET_READS: they return every row a partial
+index (CREATE INDEX ... WHERE) holds, so walking that partial index is the least they can read.
+The few hot queries that live outside the handlers are listed literally in OTHER_HOT_QUERIES.
+Run it after touching the schema, the indexes or one of the queries.
+
+Usage:
+    python check_query_plans.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+from DatabaseUtils.connection_pool import ConnectionPool
+from DatabaseUtils.database_messages import MessageDatabaseHandler
+from DatabaseUtils.database_writer import DatabaseWriter
+
+HOT_TABLES = ("messages", "message_images")
+
+# name -> fn(db); every SELECT these run is checked
+HOT_HANDLER_CALLS = {
+    "get_project_messages(project)": lambda db: db.get_project_messages(project_name="Project", with_images=True),
+    "get_project_messages(project, only_unprocessed)": lambda db: db.get_project_messages(project_name="Project", only_unprocessed=True),
+    "get_project_messages(only_unprocessed)": lambda db: db.get_project_messages(only_unprocessed=True, with_images=True),
+    "get_messages_page(project)": lambda db: db.get_messages_page(project_name="Project", limit=50, before_timestamp="2025-01-02", before_id=10),
+    "get_message": lambda db: db.get_message(1),
+    "get_reminder_messages": lambda db: db.get_reminder_messages(with_images=True),
+    "get_message_images": lambda db: db.get_message_images(1),
+    "get_undescribed_images (image worker first slice)": lambda db: db.get_undescribed_images(limit=32, after_id=0),
+    "count_undescribed_images": lambda db: db.count_undescribed_images(after_id=0),
+    "get_described_images (get_image_descriptions)": lambda db: db.get_described_images(),
+}
+
+# Calls that read a whole partial-index subset and may walk that partial index
+WHOLE_SUBSET_READS = {
+    "get_project_messages(only_unprocessed)",  # every unprocessed message (idx_messages_unprocessed)
+    "get_reminder_messages",  # every message with a reminder, in the index's order (idx_messages_reminders)
+    "get_described_images (get_image_descriptions)",  # every described image (idx_message_images_described)
+}
+
+# name -> (sql, params); queries written inline elsewhere, keep in sync with their source
+OTHER_HOT_QUERIES = {
+    "active reminders (Utils/reminder_manager.py check_reminders)": (
+        "SELECT id, content, remind, reoccurences FROM messages WHERE remind IS NOT NULL AND remind != '' AND done = 0", ()),
+}
+
+
+def populate(db):
+    """A few rows, so the handlers run every query (e.g. the image lookup of with_images)."""
+    for i in range(3):
+        message_id = db.add_message({
+            'content': f"Plan check message {i}", 'timestamp': f"2025-01-01T10:0{i}:00",
+            'project': "Project", 'files': None, 'extra': None, 'processed': 0, 'remind': "2025-01-02T10:00:00",
+            'importance': None, 'reoccurences': None, 'done': 0
+        })
+        image_id = db.add_message_image(message_id, f"uploads/message_images/plan_check_{i}.png", f"2025-01-01T10:0{i}:00")
+        if i == 0:
+            db.update_image_descriptions({image_id: "A described image"})
+
+
+def capture_statements(db, fn):
+    """Runs fn(db) and returns the SELECT statements it sent, with their parameters inlined."""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        fn(db)
+    finally:
+        db.conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def table_aliases(sql):
+    """Names a hot table can appear under in the plan of `sql` (the table itself and its aliases)."""
+    names = set(HOT_TABLES)
+    for table in HOT_TABLES:
+        for match in re.finditer(rf"\b{table}\s+(?:AS\s+)?(\w+)", sql, re.IGNORECASE):
+            if match.group(1).upper() not in ("WHERE", "JOIN", "ON", "ORDER", "GROUP", "LIMIT", "INNER", "LEFT"):
+                names.add(match.group(1))
+    return names
+
+
+def partial_indexes(db):
+    db.cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    return {name for name, sql in db.cursor.fetchall() if re.search(r"\bWHERE\b", sql, re.IGNORECASE)}
+
+
+def scanned_tables(plan_details, names, allowed_indexes=()):
+    """The plan steps that scan one of `names`, with or without an index (other than `allowed_indexes`)."""
+    scans = []
+    for detail in plan_details:
+        match = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+        if match and match.group(1) in names and (match.group(2) is None or match.group(2) not in allowed_indexes):
+            scans.append(detail)
+    return scans
+
+
+def check(db, name, sql, params=()):
+    db.cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    details = [row[3] for row in db.cursor.fetchall()]
+    allowed_indexes = partial_indexes(db) if name in WHOLE_SUBSET_READS else ()
+    scans = scanned_tables(details, table_aliases(sql), allowed_indexes)
+    print(f"[{'OK' if not scans else 'SCAN'}] {name}")
+    print(f"      {' '.join(sql.split())[:140]}")
+    for detail in details:
+        print(f"        {detail}")
+    return not scans
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = MessageDatabaseHandler(db_name=os.path.join(tmp_dir, "messages_plan_check.db"))
+        try:
+            populate(db)
+            for name, fn in HOT_HANDLER_CALLS.items():
+                statements = capture_statements(db, fn)
+                if not statements:
+                    failures += 1
+                    print(f"[NO QUERY] {name}: nothing captured, update HOT_HANDLER_CALLS")
+                for sql in statements:
+                    failures += 0 if check(db, name, sql) else 1
+            for name, (sql, params) in OTHER_HOT_QUERIES.items():
+                failures += 0 if check(db, name, sql, params) else 1
+        finally:
+            db.close()
+            DatabaseWriter.stop_all()
+            ConnectionPool.close_all()
+
+    if failures:
+        print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} scanning {' or '.join(HOT_TABLES)}.")
+        sys.exit(1)
+    print("\nAll hot queries are index searches.")
+
+
+if __name__ == "__main__":
+    main()
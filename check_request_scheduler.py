@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Checks RequestScheduler (Utils/model_handler.py) against the offline FakeModelClient.
+
+- the request bucket never lets more than `requests_per_minute` calls through per minute
+  (with an injected clock/sleep, so this runs instantly)
+- transient errors (429, 5xx) are retried up to `max_retries` times, then raised
+- non-retryable errors (e.g. 400) are raised right away
+- concurrent calls with the same key reach the model once
+
+Run it after touching the scheduler.
+
+Usage:
+    python check_request_scheduler.py
+"""
+
+import sys
+import threading
+
+from Utils.fake_model_client import FakeAPIError, FakeModelClient
+from Utils.model_handler import RequestScheduler
+
+MODEL = "gemini-fake"
+CONTENTS = [{"role": "user", "parts": [{"text": "Hello"}]}]
+
+
+class FakeClock:
+    """Clock whose sleep() just moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FlakyCall:
+    """Raises FakeAPIError(code) on the first `failures` calls, then asks the fake model."""
+
+    def __init__(self, fake, code, failures):
+        self.fake = fake
+        self.code = code
+        self.failures = failures
+        self.attempts = 0
+
+    def __call__(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise FakeAPIError(self.code, "injected failure")
+        return self.fake.models.generate_content(model=MODEL, contents=CONTENTS)
+
+
+def check_rate_cap():
+    clock = FakeClock()
+    rpm = 10
+    scheduler = RequestScheduler(requests_per_minute=rpm, clock=clock, sleep=clock.sleep)
+    fake = FakeModelClient(latency=0)
+    sent_at = []
+    for _ in range(3 * rpm):
+        scheduler.call(lambda: (sent_at.append(clock()), fake.models.generate_content(model=MODEL, contents=CONTENTS)))
+    # The bucket starts full (rpm requests) and refills rpm per 60s
+    over_cap = [i for i, t in enumerate(sent_at) if i + 1 > rpm + t * rpm / 60.0 + 1e-6]
+    assert not over_cap, f"requests {over_cap} went over the cap"
+    assert fake.request_count == 3 * rpm, fake.request_count
+    assert sent_at[-1] >= (2 * rpm - 1) * 60.0 / rpm - 1e-6, f"last request sent too early ({sent_at[-1]:.1f}s)"
+    return f"{len(sent_at)} requests at {rpm}/min took {sent_at[-1]:.0f}s of (fake) time"
+
+
+def check_retries_transient():
+    clock = FakeClock()
+    scheduler = RequestScheduler(max_retries=5, clock=clock, sleep=clock.sleep)
+    fake = FakeModelClient(latency=0)
+    flaky = FlakyCall(fake, 503, failures=2)
+    response = scheduler.call(flaky)
+    assert response.text, "no response after retrying"
+    assert flaky.attempts == 3, flaky.attempts
+    assert scheduler.retries == 2, scheduler.retries
+    assert fake.request_count == 1, fake.request_count
+    return "503 twice -> 2 retries, then answered"
+
+
+def check_retries_exhausted():
+    clock = FakeClock()
+    scheduler = RequestScheduler(max_retries=3, clock=clock, sleep=clock.sleep)
+    flaky = FlakyCall(FakeModelClient(latency=0), 429, failures=100)
+    try:
+        scheduler.call(flaky)
+    except FakeAPIError as e:
+        assert e.code == 429, e.code
+    else:
+        raise AssertionError("429 was not raised once the retries ran out")
+    assert flaky.attempts == 4, flaky.attempts
+    assert scheduler.retries == 3, scheduler.retries
+    return "429 every time -> 3 retries, then raised"
+
+
+def check_no_retry_permanent():
+    clock = FakeClock()
+    scheduler = RequestScheduler(max_retries=5, clock=clock, sleep=clock.sleep)
+    flaky = FlakyCall(FakeModelClient(latency=0), 400, failures=100)
+    try:
+        scheduler.call(flaky)
+    except FakeAPIError as e:
+        assert e.code == 400, e.code
+    else:
+        raise AssertionError("400 was not raised")
+    assert flaky.attempts == 1, flaky.attempts
+    assert scheduler.retries == 0, scheduler.retries
+    return "400 -> raised without retrying"
+
+
+def check_coalescing():
+    callers = 5
+    scheduler = RequestScheduler()
+    fake = FakeModelClient(latency=0.3)  # long enough for every caller to arrive while the first is in flight
+    barrier = threading.Barrier(callers)
+    results = [None] * callers
+
+    def caller(index):
+        barrier.wait()
+        results[index] = scheduler.call(
+            lambda: fake.models.generate_content(model=MODEL, contents=CONTENTS), key="same request").text
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake.request_count == 1, f"{fake.request_count} upstream requests"
+    assert scheduler.coalesced == callers - 1, scheduler.coalesced
+    assert len(set(results)) == 1 and results[0], results
+    return f"{callers} concurrent callers -> 1 upstream request"
+
+
+CHECKS = [
+    ("rate cap", check_rate_cap),
+    ("retry on transient errors", check_retries_transient),
+    ("give up after max_retries", check_retries_exhausted),
+    ("no retry on 400", check_no_retry_permanent),
+    ("coalesce identical requests", check_coalescing),
+]
+
+
+def main():
+    failures = 0
+    for name, check in CHECKS:
+        try:
+            detail = check()
+            print(f"[OK] {name}: {detail}")
+        except AssertionError as e:
+            failures += 1
+            print(f"[FAIL] {name}: {e}")
+
+    if failures:
+        print(f"\n{failures} scheduler check{'' if failures == 1 else 's'} failed.")
+        sys.exit(1)
+    print("\nAll scheduler checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,17 @@ import sys
 import os
 import json
 import threading
+import time
 import DatabaseUtils.database_messages as db_messages
 import DatabaseUtils.database_projects as db_projects
 import DatabaseUtils.database_clipboard as db_clipboard # Added for clipboard messages
+from DatabaseUtils.connection_pool import ConnectionPool
+from DatabaseUtils.database_writer import DatabaseWriter
+from DatabaseUtils.fts import fuse_rankings
 from Utils.model_handler import ModelClient
+from Utils.chat_history import ChatHistoryStore
+from Utils.job_runner import JobRunner
+from Utils.image_description_worker import ImageDescriptionWorker
 from Utils import telegram_utils
 from Utils.reminder_scheduler import ReminderScheduler
 from datetime import datetime
@@ -25,7 +32,8 @@ except ImportError:
     webview = None
 
 # --- Model and DB logic ---
-model_handler = ModelClient(mode="gemini", model_context_window=500000)
+# REMAINDER_MODEL_BACKEND=fake runs every model call against the offline FakeModelClient
+model_handler = ModelClient(mode=os.getenv("REMAINDER_MODEL_BACKEND", "gemini"), model_context_window=500000)
 reminder_scheduler = ReminderScheduler()
 
 CLIPBOARD_PROJECT_NAME = "Saved Clips"
@@ -50,6 +58,19 @@ def get_settings_file_path():
 DEFAULT_SETTINGS = {
     "clipboard_save_count": 5,
     "include_image_descriptions": True,  # Whether to include image descriptions in context
+    "message_page_size": 50,  # Messages per page returned by get_messages_page
+    "context_mode": "retrieval",  # "retrieval": send only locally ranked messages to the model, "full": send the whole context
+    "retrieval_top_k": 200,  # Max lexically ranked messages considered in retrieval mode
+    "retrieval_recent_messages": 20,  # Most recent messages always included in retrieval mode
+    "retrieval_token_budget": 50000,  # Token budget for the retrieved context
+    "model_response_cache": True,  # Reuse stored model responses for identical requests (Databases/model_cache.db)
+    "model_response_cache_ttl_hours": 24,  # How long a stored model response stays valid
+    "chat_history_token_budget": 8000,  # Max tokens of model chat history replayed per context (oldest turns dropped)
+    "chat_history_max_contexts": 20,  # Max contexts with a model chat history kept in memory
+    "image_worker_enabled": True,  # Describe new images in the background
+    "image_worker_concurrency": 2,  # Image-description requests sent at the same time
+    "image_worker_batch_images": 8,  # Max images per image-description request
+    "image_worker_batch_mb": 8,  # Max MB of image files per image-description request
     # Add other future settings here
 }
 # --- End Settings File Configuration ---
@@ -57,16 +78,29 @@ DEFAULT_SETTINGS = {
 class Api:
     def __init__(self):
         self._message_cache = {}
-        self._chat_history_cache = {}
+        self._message_cache_lock = threading.RLock()  # UI calls, the image worker, jobs and chat streams all touch it
+        self._model_chat_streams = {}  # {stream_id: {'pieces', 'done', 'error', 'started_at'}}
+        self._model_chat_streams_lock = threading.Lock()
+        self._jobs = JobRunner(max_workers=2)  # long AI passes, off the pywebview bridge thread
         self._check_projects = False
         self._show_clips_in_main_chat = False # New filter state, default to false
         
         # --- Load Application Settings ---
         self.settings = self._load_settings()
+        self._apply_model_settings()
         # --- End Load Application Settings ---
 
+        self._chat_history = ChatHistoryStore(count_tokens=model_handler._count_tokens)
+        self._apply_chat_history_settings()
+
         reminder_scheduler.start()
 
+        self._image_worker = ImageDescriptionWorker(
+            describe=self._process_images_with_gemini,
+            resolve_path=self._image_disk_path,
+            on_described=lambda count: self._evict_stale_message_cache())  # drop the contexts whose images got descriptions
+        self._apply_image_worker_settings()
+
         self.image_upload_folder_name = os.path.join("uploads", "message_images")
         if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
             app_support_dir = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support', 'RemainderApp')
@@ -211,11 +245,12 @@ class Api:
             timestamp = datetime.now().isoformat()
             message_id = db_clip.add_message(content, timestamp)
             if message_id:
-                self._invalidate_message_cache(CLIPBOARD_PROJECT_NAME)
-                main_chat_clips_on_key = self._get_context_key(None) # This key depends on _show_clips_in_main_chat
-                if self._show_clips_in_main_chat and main_chat_clips_on_key in self._message_cache: # Only invalidate if clips are shown
-                     del self._message_cache[main_chat_clips_on_key]
-                     print(f"Invalidated main chat (clips on) cache due to new clipboard entry.")
+                # Patch the cached clip views in place instead of reloading them
+                new_clip = self._clip_to_message({'id': message_id, 'content': content, 'timestamp': timestamp})
+                self._patch_message_cache(new_clip, {
+                    f"__project_{CLIPBOARD_PROJECT_NAME}": (1,),
+                    "__main_chat_clips_True": (0, 1),
+                })
                 return {'success': True, 'id': f"clip_{message_id}"}
             else:
                 return {'success': False, 'error': "Failed to add clipboard entry to DB."}
@@ -242,17 +277,28 @@ class Api:
         # Invalidate both previous and new main chat cache states to be sure
         # Key for state when clips were OFF
         key_clips_off = f"__main_chat_clips_False"
-        if key_clips_off in self._message_cache:
-            del self._message_cache[key_clips_off]
-            print(f"Invalidated cache for main chat (clips off).")
+        with self._message_cache_lock:
+            if self._message_cache.pop(key_clips_off, None) is not None:
+                print(f"Invalidated cache for main chat (clips off).")
         # Key for state when clips were ON
         key_clips_on = f"__main_chat_clips_True"
-        if key_clips_on in self._message_cache:
-            del self._message_cache[key_clips_on]
-            print(f"Invalidated cache for main chat (clips on).")
+        with self._message_cache_lock:
+            if self._message_cache.pop(key_clips_on, None) is not None:
+                print(f"Invalidated cache for main chat (clips on).")
             
         return {'success': True, 'show_clips_in_main_chat': self._show_clips_in_main_chat}
 
+    def _clip_to_message(self, clip):
+        """Shapes a clipboard_messages row like a regular message so the UI can render it."""
+        return {
+            'id': f"clip_{clip['id']}",
+            'content': clip['content'],
+            'timestamp': clip['timestamp'],
+            'project': CLIPBOARD_PROJECT_NAME,
+            'images': [], 'files': None, 'extra': None, 'processed': 1,
+            'remind': None, 'importance': None, 'reoccurences': None, 'done': False
+        }
+
     # --- Cache and Context Key Management ---
     def _get_context_key(self, project):
         if project == CLIPBOARD_PROJECT_NAME:
@@ -263,20 +309,190 @@ class Api:
 
     def _invalidate_message_cache(self, project=None):
         context_key = self._get_context_key(project)
-        if context_key in self._message_cache:
-            del self._message_cache[context_key]
-            print(f"Cache invalidated for context key: {context_key}")
+        with self._message_cache_lock:
+            if self._message_cache.pop(context_key, None) is not None:
+                print(f"Cache invalidated for context key: {context_key}")
         # else:
             # print(f"Attempted to invalidate cache for {context_key}, but it was not found (this is often OK).")
 
+    def _read_change_versions(self):
+        """
+        Reads the change counters of messages.db and clipboard_messages.db (kept up to date by
+        triggers, so writes from the Telegram sync or the reminder scheduler are seen too).
+        Returns (message_versions, clip_version), or None if they couldn't be read.
+        """
+        db_msg_handler = None
+        db_clip_handler = None
+        try:
+            db_msg_handler = db_messages.MessageDatabaseHandler()
+            db_clip_handler = db_clipboard.ClipboardMessagesDatabaseHandler()
+            return db_msg_handler.get_change_versions(), db_clip_handler.get_change_version()
+        except Exception as e:
+            print(f"[Error] Reading change versions failed: {e}")
+            return None
+        finally:
+            if db_msg_handler: db_msg_handler.close()
+            if db_clip_handler: db_clip_handler.close()
+
+    def _context_version(self, context_key, change_versions):
+        """The version a cached context was built from, derived from the counters of the data it shows."""
+        if change_versions is None:
+            return None
+        message_versions, clip_version = change_versions
+        if context_key == f"__project_{CLIPBOARD_PROJECT_NAME}":
+            return (clip_version,)
+        if context_key == "__main_chat_clips_True":
+            return (message_versions.get('all', 0), clip_version)
+        if context_key == "__main_chat_clips_False":
+            return (message_versions.get('all', 0),)
+        return (message_versions.get(f"project:{context_key}", 0),)
+
+    def _evict_stale_message_cache(self):
+        """Drops only the cached contexts whose data changed since they were loaded."""
+        change_versions = self._read_change_versions()
+        with self._message_cache_lock:
+            for context_key in list(self._message_cache):
+                version = self._context_version(context_key, change_versions)
+                entry = self._message_cache.get(context_key)
+                if entry is not None and (version is None or entry['version'] != version):
+                    del self._message_cache[context_key]
+                    print(f"Cache invalidated for context key: {context_key}")
+
+    @staticmethod
+    def _insert_newest_first(messages, message):
+        """Binary-search insert into a list sorted by timestamp, newest first (ahead of equal timestamps). Returns the index."""
+        timestamp = message.get('timestamp') or ''
+        lo, hi = 0, len(messages)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (messages[mid].get('timestamp') or '') > timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        messages.insert(lo, message)
+        return lo
+
+    def _patch_message_cache(self, message, deltas):
+        """
+        Applies a newly added message to the cached contexts it belongs to, instead of evicting them.
+
+        `deltas` maps each affected context key to how much the add moved that context's change
+        counters. An entry is patched only if its version plus the delta is exactly the current
+        version, i.e. nothing else was written since it was loaded; otherwise it's evicted and
+        reloaded on the next read. Project views keep the database (insertion) order, the other
+        views are sorted newest first.
+        """
+        with self._message_cache_lock:
+            if not any(key in self._message_cache for key in deltas):
+                return
+        change_versions = self._read_change_versions()
+        with self._message_cache_lock:
+            self._patch_message_cache_locked(message, deltas, change_versions)
+
+    def _patch_message_cache_locked(self, message, deltas, change_versions):
+        for context_key in deltas:
+            entry = self._message_cache.get(context_key)
+            if entry is None:
+                continue
+            current_version = self._context_version(context_key, change_versions)
+            expected_version = tuple(v + d for v, d in zip(entry['version'] or (), deltas[context_key]))
+            if current_version is None or current_version != expected_version:
+                del self._message_cache[context_key]
+                print(f"Cache invalidated for context key: {context_key}")
+                continue
+            cached_message = dict(message)  # each view gets its own dict, like after a reload
+            if context_key.startswith("__"):
+                position = self._insert_newest_first(entry['messages'], cached_message)
+            else:
+                entry['messages'].append(cached_message)
+                position = len(entry['messages']) - 1
+            entry['version'] = current_version
+
+            # Keep the cached context strings in step: add the new line, and extend the joined
+            # string when the message landed at either end (the usual case), else rejoin it lazily
+            for (context_format, include_image_descriptions), cached in entry.get('context_strings', {}).items():
+                line = self._format_context_line(cached_message, context_format, include_image_descriptions)
+                cached['lines'][cached_message['id']] = line
+                if cached['string'] is None:
+                    continue
+                separator = self.CONTEXT_FORMATS[context_format]
+                if len(entry['messages']) == 1:
+                    cached['string'] = line
+                elif position == 0:
+                    cached['string'] = line + separator + cached['string']
+                elif position == len(entry['messages']) - 1:
+                    cached['string'] = cached['string'] + separator + line
+                else:
+                    cached['string'] = None
+
+    # Line separator of each model context format: "chat" for model_chat / model_select_messages,
+    # "assign" for model_assign_projects / model_create_projects
+    CONTEXT_FORMATS = {"chat": "\n\n", "assign": "\n"}
+
+    @staticmethod
+    def _format_context_line(msg, context_format, include_image_descriptions):
+        """Formats one message the way the given model context format expects it."""
+        if context_format == "chat":
+            line = f"ID: {msg.get('id', '')}, Timestamp: {msg.get('timestamp', '')}, Project: {msg.get('project', '')}, Extra: {msg.get('extra', '')}, Text: {msg.get('content', '')}"
+        else:
+            line = f"ID: {msg['id']}, Content: {msg['content']}, Project: {msg['project']}"
+            if msg.get('extra'):
+                line += f", Context: {msg['extra']}"
+        # Add image descriptions if present and enabled
+        if include_image_descriptions and msg.get('images'):
+            for i, img in enumerate(msg['images']):
+                if img.get('description'):
+                    line += f"\n[Image {i+1} Description: {img['description']}]"
+        return line
+
+    def _get_context_string(self, project, context_format, messages=None):
+        """
+        Returns the model context string for a context, or for a subset of its `messages`.
+
+        Formatted lines are cached per (context_format, include_image_descriptions) next to the
+        cached messages, and so is the joined string of the whole context, so follow-up calls
+        don't re-serialize every message. _patch_message_cache keeps both up to date on adds;
+        evicting the messages drops them too.
+        """
+        all_messages = self._get_messages_with_cache(project)
+        if messages is None:
+            messages = all_messages
+        include_image_descriptions = self.settings.get("include_image_descriptions", DEFAULT_SETTINGS["include_image_descriptions"])
+        separator = self.CONTEXT_FORMATS[context_format]
+
+        with self._message_cache_lock:
+            entry = self._message_cache.get(self._get_context_key(project))
+            if entry is not None and entry['messages'] is all_messages:
+                return self._cached_context_string(entry, all_messages, messages, context_format, include_image_descriptions)
+        # Loading failed or the context changed under us, format without caching
+        return separator.join(self._format_context_line(m, context_format, include_image_descriptions) for m in messages)
+
+    def _cached_context_string(self, entry, all_messages, messages, context_format, include_image_descriptions):
+        """_get_context_string's cached path; called with _message_cache_lock held."""
+        separator = self.CONTEXT_FORMATS[context_format]
+        cached = entry.setdefault('context_strings', {}).setdefault(
+            (context_format, bool(include_image_descriptions)), {'lines': {}, 'string': None})
+        lines = cached['lines']
+        for msg in messages:
+            if msg['id'] not in lines:
+                lines[msg['id']] = self._format_context_line(msg, context_format, include_image_descriptions)
+
+        if messages is all_messages:
+            if cached['string'] is None:
+                cached['string'] = separator.join(lines[m['id']] for m in all_messages)
+            return cached['string']
+        return separator.join(lines[m['id']] for m in messages)
+
     def _get_messages_with_cache(self, project=None):
         context_key = self._get_context_key(project)
-        cached_entry = self._message_cache.get(context_key)
-
-        # Simplified cache check: Rely on explicit invalidation.
-        # If a more robust staleness check is needed, the 'cache_key' (version) can be used.
-        # For now, if it's in cache, it's considered good.
-        if cached_entry:
+        with self._message_cache_lock:
+            cached_entry = self._message_cache.get(context_key)
+
+        # A cached context is good as long as the change counters of the data it shows haven't
+        # moved, so edits elsewhere (other projects, background processing) keep it hot.
+        # The version is read before loading: a write racing the load just causes a reload next time.
+        version = self._context_version(context_key, self._read_change_versions())
+        if cached_entry and version is not None and cached_entry['version'] == version:
             return cached_entry['messages']
 
         messages_data = []
@@ -287,51 +503,26 @@ class Api:
             if project == CLIPBOARD_PROJECT_NAME:
                 db_clip_handler = db_clipboard.ClipboardMessagesDatabaseHandler()
                 raw_clip_messages = db_clip_handler.get_all_messages()
-                for msg in raw_clip_messages:
-                    messages_data.append({
-                        'id': f"clip_{msg['id']}",
-                        'content': msg['content'],
-                        'timestamp': msg['timestamp'],
-                        'project': CLIPBOARD_PROJECT_NAME,
-                        'images': [], 'files': None, 'extra': None, 'processed': 1,
-                        'remind': None, 'importance': None, 'reoccurences': None, 'done': False
-                    })
+                messages_data.extend(self._clip_to_message(msg) for msg in raw_clip_messages)
             elif project is None: # Main Chat
                 db_msg_handler = db_messages.MessageDatabaseHandler()
-                true_main_messages_raw = db_msg_handler.get_project_messages(project_name=None)
-                for msg_raw in true_main_messages_raw:
-                    msg_dict = dict(msg_raw)
-                    msg_dict['images'] = db_msg_handler.get_message_images(msg_dict['id']) if db_msg_handler else []
-                    messages_data.append(msg_dict)
+                messages_data.extend(db_msg_handler.get_project_messages(project_name=None, with_images=True))
 
                 if self._show_clips_in_main_chat:
                     db_clip_handler = db_clipboard.ClipboardMessagesDatabaseHandler()
                     raw_clip_messages = db_clip_handler.get_all_messages()
-                    for msg in raw_clip_messages:
-                        messages_data.append({
-                            'id': f"clip_{msg['id']}",
-                            'content': msg['content'],
-                            'timestamp': msg['timestamp'],
-                            'project': CLIPBOARD_PROJECT_NAME,
-                            'images': [], 'files': None, 'extra': None, 'processed': 1,
-                            'remind': None, 'importance': None, 'reoccurences': None, 'done': False
-                        })
+                    messages_data.extend(self._clip_to_message(msg) for msg in raw_clip_messages)
                 messages_data.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
             
             else: # Regular project
                 db_msg_handler = db_messages.MessageDatabaseHandler()
-                raw_project_messages = db_msg_handler.get_project_messages(project_name=project)
-                for msg_raw in raw_project_messages:
-                    msg_dict = dict(msg_raw)
-                    msg_dict['images'] = db_msg_handler.get_message_images(msg_dict['id']) if db_msg_handler else []
-                    messages_data.append(msg_dict)
+                messages_data.extend(db_msg_handler.get_project_messages(project_name=project, with_images=True))
             
-            # Use a simple timestamp of caching as the cache key for now.
-            # More sophisticated versioning (e.g., based on content hash or count+latest_ts) can be added if needed.
-            self._message_cache[context_key] = {
-                'messages': messages_data,
-                'cache_key': datetime.now().isoformat() 
-            }
+            with self._message_cache_lock:
+                self._message_cache[context_key] = {
+                    'messages': messages_data,
+                    'version': version
+                }
             return messages_data
         except Exception as e:
             import traceback
@@ -342,25 +533,87 @@ class Api:
             if db_msg_handler: db_msg_handler.close()
             if db_clip_handler: db_clip_handler.close()
 
+    def _retrieve_context_messages(self, prompt, project, messages_data):
+        """
+        Narrows a context down to the messages worth sending to the model for `prompt`.
+
+        Candidates are ranked locally with the FTS5 index (BM25, any word of the prompt),
+        the most recent messages are always kept, and the result is packed into the
+        'retrieval_token_budget'. Returns messages_data unchanged in "full" context mode, or
+        when nothing matches lexically (e.g. "summarize my notes"), so the model still sees
+        everything. The selected messages keep their original order.
+        """
+        context_mode = self.settings.get("context_mode", DEFAULT_SETTINGS["context_mode"])
+        if context_mode != "retrieval" or not messages_data:
+            return messages_data
+
+        top_k = int(self.settings.get("retrieval_top_k", DEFAULT_SETTINGS["retrieval_top_k"]))
+        recent_count = int(self.settings.get("retrieval_recent_messages", DEFAULT_SETTINGS["retrieval_recent_messages"]))
+        token_budget = int(self.settings.get("retrieval_token_budget", DEFAULT_SETTINGS["retrieval_token_budget"]))
+
+        by_id = {str(m['id']): m for m in messages_data}
+        ranked_messages = []
+        ranked_clips = []
+        db_msg_handler = None
+        db_clip_handler = None
+        try:
+            if project != CLIPBOARD_PROJECT_NAME:
+                db_msg_handler = db_messages.MessageDatabaseHandler()
+                ranked_messages = db_msg_handler.search_messages(prompt, project_name=project, limit=top_k, match_any=True)
+            if any(str(m['id']).startswith("clip_") for m in messages_data):
+                db_clip_handler = db_clipboard.ClipboardMessagesDatabaseHandler()
+                ranked_clips = [{'id': f"clip_{clip['id']}", 'score': clip['score']}
+                                for clip in db_clip_handler.search_messages(prompt, limit=top_k, match_any=True)]
+        except Exception as e:
+            print(f"[Retrieval] Search failed, using full context: {e}")
+            return messages_data
+        finally:
+            if db_msg_handler: db_msg_handler.close()
+            if db_clip_handler: db_clip_handler.close()
+
+        ranked = fuse_rankings([ranked_messages, ranked_clips])
+        ranked_ids = [str(r['id']) for r in ranked if str(r['id']) in by_id][:top_k]
+        if not ranked_ids:
+            print(f"[Retrieval] No lexical matches for prompt, using full context ({len(messages_data)} messages).")
+            return messages_data
+
+        recent_ids = [str(m['id']) for m in sorted(messages_data, key=lambda m: m.get('timestamp') or '', reverse=True)[:recent_count]]
+
+        selected_ids = set()
+        used_tokens = 0
+        for msg_id in recent_ids + ranked_ids:
+            if msg_id in selected_ids:
+                continue
+            msg = by_id[msg_id]
+            text = msg.get('content') or ''
+            for img in msg.get('images') or []:
+                text += " " + (img.get('description') or '')
+            tokens = model_handler._count_tokens(text) + 20  # + the ID/Timestamp/Project prefix of the context line
+            if used_tokens + tokens > token_budget:
+                continue
+            selected_ids.add(msg_id)
+            used_tokens += tokens
+
+        selected = [m for m in messages_data if str(m['id']) in selected_ids]
+        print(f"[Retrieval] Sending {len(selected)} of {len(messages_data)} messages (~{used_tokens} tokens).")
+        return selected
+
     def _get_chat_history(self, project=None):
-        context_key = self._get_context_key(project)
-        return self._chat_history_cache.get(context_key, [])
+        return self._chat_history.get(self._get_context_key(project))
 
     def _set_chat_history(self, history, project=None):
-        context_key = self._get_context_key(project)
-        self._chat_history_cache[context_key] = history
+        # Trimmed to the token budget, least recently used contexts are evicted
+        self._chat_history.set(self._get_context_key(project), history)
 
     def reset_model_chat_history(self, project=None):
-        context_key = self._get_context_key(project)
-        if context_key in self._chat_history_cache:
-            del self._chat_history_cache[context_key]
+        self._chat_history.reset(self._get_context_key(project))
         return {'success': True}
 
     def refresh_telegram_messages(self):
         try:
             telegram_utils.retrive_messages(save_to_file=False)
-            # Reset the message cache to force refresh
-            self._message_cache = {}
+            # Drop the contexts the new messages landed in
+            self._evict_stale_message_cache()
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -375,14 +628,130 @@ class Api:
         """Public API to get all messages for a project or main chat, using cache."""
         return self._get_messages_with_cache(project)
 
+    def get_messages_page(self, project=None, cursor=None, page_size=None):
+        """
+        Keyset-paginated version of get_all_messages, newest first.
+
+        Args:
+            project: Project name, CLIPBOARD_PROJECT_NAME, or None for the main chat
+                     (which includes Saved Clips when the clipboard filter is on).
+            cursor (dict): {'timestamp', 'id'} of the last message of the previous page,
+                           None for the most recent page.
+            page_size (int): Defaults to the 'message_page_size' setting.
+
+        Returns:
+            dict: {'messages': [...], 'next_cursor': dict or None, 'has_more': bool}
+        """
+        if page_size is None:
+            page_size = self.settings.get("message_page_size", DEFAULT_SETTINGS["message_page_size"])
+        page_size = max(1, int(page_size))
+
+        before_ts = cursor.get('timestamp') if cursor else None
+        before_id = cursor.get('id') if cursor else None
+        cursor_is_clip = isinstance(before_id, str) and before_id.startswith("clip_")
+
+        include_messages = project != CLIPBOARD_PROJECT_NAME
+        include_clips = project == CLIPBOARD_PROJECT_NAME or (project is None and self._show_clips_in_main_chat)
+
+        # Merged order is (timestamp, messages before clips, id) descending. Each source is
+        # asked for page_size + 1 rows past the cursor, which is enough to fill the page and
+        # to know whether anything is left.
+        candidates = []
+        db_msg_handler = None
+        db_clip_handler = None
+        try:
+            if include_messages:
+                db_msg_handler = db_messages.MessageDatabaseHandler()
+                if before_ts is None:
+                    msg_before_id = None
+                elif cursor_is_clip:
+                    msg_before_id = None  # messages sharing the clip's timestamp were already returned
+                else:
+                    msg_before_id = int(before_id)
+                candidates.extend(db_msg_handler.get_messages_page(
+                    project_name=project, limit=page_size + 1,
+                    before_timestamp=before_ts, before_id=msg_before_id, with_images=True))
+
+            if include_clips:
+                db_clip_handler = db_clipboard.ClipboardMessagesDatabaseHandler()
+                if before_ts is None:
+                    clip_before_id = None
+                elif cursor_is_clip:
+                    clip_before_id = int(before_id.split("_", 1)[1])
+                else:
+                    clip_before_id = 2 ** 63 - 1  # clips sharing a message's timestamp come after it
+                raw_clips = db_clip_handler.get_messages_page(
+                    limit=page_size + 1, before_timestamp=before_ts, before_id=clip_before_id)
+                candidates.extend(self._clip_to_message(clip) for clip in raw_clips)
+
+            def merge_key(msg):
+                msg_id = msg['id']
+                if isinstance(msg_id, str) and msg_id.startswith("clip_"):
+                    return (msg.get('timestamp') or '', 0, int(msg_id.split("_", 1)[1]))
+                return (msg.get('timestamp') or '', 1, int(msg_id))
+
+            candidates.sort(key=merge_key, reverse=True)
+            page = candidates[:page_size]
+            has_more = len(candidates) > page_size
+            next_cursor = {'timestamp': page[-1]['timestamp'], 'id': page[-1]['id']} if has_more and page else None
+            return {'messages': page, 'next_cursor': next_cursor, 'has_more': has_more}
+        except Exception as e:
+            import traceback
+            print(f"[Error] get_messages_page failed for project '{project}': {e}")
+            print(traceback.format_exc())
+            return {'messages': [], 'next_cursor': None, 'has_more': False, 'error': str(e)}
+        finally:
+            if db_msg_handler: db_msg_handler.close()
+            if db_clip_handler: db_clip_handler.close()
+
+    def search_messages(self, query, project=None, limit=50):
+        """
+        Full-text search (SQLite FTS5, BM25 ranking) over messages, image descriptions and saved clips.
+
+        Args:
+            query (str): Free text as typed by the user; the last word is matched as a prefix.
+            project: Restrict to one project, CLIPBOARD_PROJECT_NAME for clips only, or None for everything.
+            limit (int): Maximum number of results.
+
+        Returns:
+            dict: {'success': True, 'results': [...]} with messages shaped like get_all_messages
+                  plus 'score' (higher is better; reciprocal-rank fused across messages
+                  and clips) and 'snippet'.
+        """
+        db_msg_handler = None
+        db_clip_handler = None
+        try:
+            limit = max(1, int(limit))
+            message_results = []
+            clip_results = []
+            if project != CLIPBOARD_PROJECT_NAME:
+                db_msg_handler = db_messages.MessageDatabaseHandler()
+                message_results = db_msg_handler.search_messages(query, project_name=project, limit=limit)
+            if project is None or project == CLIPBOARD_PROJECT_NAME:
+                db_clip_handler = db_clipboard.ClipboardMessagesDatabaseHandler()
+                for clip in db_clip_handler.search_messages(query, limit=limit):
+                    result = self._clip_to_message(clip)
+                    result['score'] = clip['score']
+                    result['snippet'] = clip['snippet']
+                    clip_results.append(result)
+            # Merged by rank within each index, BM25 scores of two indexes aren't comparable
+            results = fuse_rankings([message_results, clip_results])
+            return {'success': True, 'results': results[:limit]}
+        except Exception as e:
+            import traceback
+            print(f"[Error] search_messages failed for query '{query}': {e}")
+            print(traceback.format_exc())
+            return {'success': False, 'results': [], 'error': str(e)}
+        finally:
+            if db_msg_handler: db_msg_handler.close()
+            if db_clip_handler: db_clip_handler.close()
+
     def get_all_reminders(self):
         db = db_messages.MessageDatabaseHandler()
         try:
-            messages_data = db.get_project_messages()
-            # For each message, fetch its images - though reminders might not typically show images, 
+            # Images are attached too - though reminders might not typically show images,
             # good to be consistent if the data structure is reused.
-            for msg_data in messages_data:
-                msg_data['images'] = db.get_message_images(msg_data['id'])
+            messages_data = db.get_project_messages(with_images=True)
             reminders = [m for m in messages_data if m.get('remind')]
         except Exception as e:
             import traceback
@@ -397,10 +766,7 @@ class Api:
         """API endpoint to get all non-done messages with reminders."""
         db = db_messages.MessageDatabaseHandler()
         try:
-            messages_data = db.get_reminder_messages() # Use the new DB handler method
-            # For each message, fetch its images
-            for msg_data in messages_data:
-                msg_data['images'] = db.get_message_images(msg_data['id'])
+            messages_data = db.get_reminder_messages(with_images=True) # Images attached in one query
         except Exception as e:
             import traceback
             print("[Error] get_reminder_messages failed:", e)
@@ -465,18 +831,19 @@ class Api:
                         except Exception as e:
                             print(f"[Error] Failed to add image to DB ({path_to_store_in_db}): {e}")
             
-            self._invalidate_message_cache(project)
-            
-            # Fetch the newly added message with its images to return
-            # To do this efficiently, we'd ideally have a get_message_by_id in db_handler
-            # For now, refetching project messages and finding it:
-            messages_in_project = db_messages_h.get_project_messages(project_name=project) 
-            returned_message = None
-            for m in reversed(messages_in_project): # Check recent messages first
-                if m['id'] == message_id:
-                    m['images'] = db_messages_h.get_message_images(message_id) # Ensure images are attached for the response
-                    returned_message = m
-                    break
+            if processed_image_paths_for_db:
+                self._image_worker.wake()
+
+            # Fetch the newly added message with its images, then patch it into the cached views
+            returned_message = db_messages_h.get_message(message_id)
+            if returned_message:
+                writes = 1 + len(processed_image_paths_for_db)  # change counter bumps: the message and each image
+                deltas = {"__main_chat_clips_False": (writes,), "__main_chat_clips_True": (writes, 0)}
+                if project and project != CLIPBOARD_PROJECT_NAME:
+                    deltas[self._get_context_key(project)] = (writes,)
+                self._patch_message_cache(returned_message, deltas)
+            else:
+                self._invalidate_message_cache(project)
             
             return {
                 'success': True, 
@@ -499,7 +866,7 @@ class Api:
             print(f"Editing message {message_id}: remind={remind}, reoccurences={reoccurences}")
             db_messages_h = db_messages.MessageDatabaseHandler()
             db_messages_h.update_message(message_id, content=content, project=project, remind=remind, importance=importance, processed=processed, done=done, reoccurences=reoccurences)
-            self._message_cache = {}
+            self._evict_stale_message_cache()
             reminder_scheduler.refresh_reminders()  # Refresh reminders after editing
             return {'success': True}
         except Exception as e:
@@ -539,13 +906,11 @@ class Api:
             db_messages_h = None
             try:
                 db_messages_h = db_messages.MessageDatabaseHandler()
-                # TODO: Get message details (esp. project) BEFORE deleting to invalidate specific cache.
-                # For now, clear relevant caches broadly.
                 db_messages_h.delete_message(message_id)
-                print(f"Regular message {message_id} deleted. Invalidating potentially related caches.")
-                # Broad invalidation as we don't know the project easily post-delete
-                self._message_cache.clear() # Simplest broad approach for now
-                self._chat_history_cache.clear()
+                print(f"Regular message {message_id} deleted. Invalidating related caches.")
+                # The delete bumped the change counters of the message's project, so only those contexts go
+                self._evict_stale_message_cache()
+                self._chat_history.clear()
                 return {'success': True}
             except Exception as e:
                 print(f"Error deleting regular message {message_id}: {e}")
@@ -560,9 +925,8 @@ class Api:
             print(f"Toggling reminder done status for ID {message_id} to {done_status}")
             # Use existing update_message, ensuring done_status is correctly interpreted (0 or 1)
             db.update_message(task_id=message_id, done=bool(done_status))
-            # Invalidate cache if necessary - though reminders view fetches directly, maybe other views use cache?
-            # For safety, let's invalidate the general cache. A more targeted approach might be possible.
-            self._message_cache = {}
+            # Reminders view fetches directly, but the message's project and main chat are cached
+            self._evict_stale_message_cache()
             return {'success': True}
         except Exception as e:
             import traceback
@@ -572,22 +936,13 @@ class Api:
         finally:
             db.close()
 
-    def model_chat(self, prompt, project=None, use_history=False, history=None):
-        """
-        Interact with the model, providing the appropriate context based on the project.
-        """
-        # Get history if using
-        if use_history:
-            chat_history = self._get_chat_history(project)
-        else:
-            chat_history = []
-
-        # Get messages from cache/DB
-        messages_data = self._get_messages_with_cache(project)
-        include_image_descriptions = self.settings.get("include_image_descriptions", DEFAULT_SETTINGS["include_image_descriptions"])
+    def _build_model_chat_context(self, prompt, project):
+        """Context string for a model_chat prompt: the retrieved messages of the project / main chat."""
+        # Get messages from cache/DB, narrowed to the ones relevant to the prompt
+        messages_data = self._retrieve_context_messages(prompt, project, self._get_messages_with_cache(project))
         
         # Format messages into a context string for the model
-        context_string = ""
+        context_string = self._get_context_string(project, "chat", messages_data)
         if not project:
             context_title = "Main Chat"
             if self._show_clips_in_main_chat:
@@ -595,32 +950,76 @@ class Api:
         else:
             context_title = f"Project: {project}"
 
-        for msg in messages_data:
-            # Core message information
-            msg_content = msg.get('content', '')
-            msg_id = msg.get('id', '')
-            msg_timestamp = msg.get('timestamp', '')
-            msg_project = msg.get('project', '')
-            msg_extra = msg.get('extra', '')
-            
-            # Build the base context line
-            context_line = f"ID: {msg_id}, Timestamp: {msg_timestamp}, Project: {msg_project}, Extra: {msg_extra}, Text: {msg_content}"
-            
-            # Add image descriptions if present and enabled
-            if include_image_descriptions and 'images' in msg and msg['images']:
-                for i, img in enumerate(msg['images']):
-                    if img.get('description'):
-                        context_line += f"\n[Image {i+1} Description: {img['description']}]"
-            
-            context_string += context_line + "\n\n"
-
         print(f"Generating model chat response in context: {context_title}")
+        return context_string
+
+    def model_chat(self, prompt, project=None, use_history=False, history=None):
+        """
+        Interact with the model, providing the appropriate context based on the project.
+        """
+        # Get history if using
+        if use_history:
+            chat_history = self._get_chat_history(project)
+        else:
+            chat_history = []
+
+        context_string = self._build_model_chat_context(prompt, project)
         
-        response, new_history = model_handler.generate(prompt=prompt, messages=context_string, json=0, history=chat_history)
+        response, new_history = model_handler.generate(prompt=prompt, messages=context_string, json=0, history=chat_history,
+                                                       context_id=self._get_context_key(project))
         self._set_chat_history(new_history, project)
         
         return {"response": response}
 
+    def start_model_chat_stream(self, prompt, project=None, use_history=False, history=None):
+        """
+        Streaming version of model_chat. Starts generating in the background and returns a
+        stream_id right away; the frontend polls poll_model_chat_stream for the text so far.
+        """
+        stream_id = uuid.uuid4().hex
+        stream = {'pieces': [], 'done': False, 'error': None, 'started_at': time.time()}
+        with self._model_chat_streams_lock:
+            # Forget streams the frontend stopped polling (e.g. the view was closed)
+            for old_id in [sid for sid, st in self._model_chat_streams.items() if time.time() - st['started_at'] > 600]:
+                del self._model_chat_streams[old_id]
+            self._model_chat_streams[stream_id] = stream
+
+        def run():
+            try:
+                chat_history = self._get_chat_history(project) if use_history else []
+                context_string = self._build_model_chat_context(prompt, project)
+                _, new_history = model_handler.generate(prompt=prompt, messages=context_string, json=0, history=chat_history,
+                                                        on_text=stream['pieces'].append, context_id=self._get_context_key(project))
+                self._set_chat_history(new_history, project)
+            except Exception as e:
+                import traceback
+                print(f"[Error] model chat stream failed: {e}")
+                print(traceback.format_exc())
+                stream['error'] = str(e)
+            finally:
+                stream['done'] = True
+
+        threading.Thread(target=run, name=f"ModelChatStream-{stream_id[:8]}", daemon=True).start()
+        return {'success': True, 'stream_id': stream_id}
+
+    def poll_model_chat_stream(self, stream_id, offset=0):
+        """
+        Returns the text generated since `offset` (the number of pieces already received),
+        the new offset and whether the response is complete.
+        """
+        with self._model_chat_streams_lock:
+            stream = self._model_chat_streams.get(stream_id)
+        if stream is None:
+            # Finished and already fetched, or pruned after 600s: nothing more will come
+            return {'success': False, 'text': "", 'offset': int(offset), 'done': True, 'error': f"Unknown stream {stream_id}"}
+        done = stream['done']  # read before the pieces, so nothing appended after it is missed
+        pieces = stream['pieces'][int(offset):]
+        if done:
+            with self._model_chat_streams_lock:
+                self._model_chat_streams.pop(stream_id, None)
+        return {'success': stream['error'] is None, 'text': "".join(pieces), 'offset': int(offset) + len(pieces),
+                'done': done, 'error': stream['error']}
+
     def run_telegram_fetch(self):
         """Fetch new Telegram messages and store them in DB and JSON."""
         from Utils import telegram_utils
@@ -649,28 +1048,9 @@ class Api:
         
         # Get comprehensive message list directly with proper project filtering
         messages_data = self._get_messages_with_cache(project)
-        include_image_descriptions = self.settings.get("include_image_descriptions", DEFAULT_SETTINGS["include_image_descriptions"])
         
-        # Format messages into a context string for the model
-        context_string = ""
-        for msg in messages_data:
-            # Core message information
-            msg_content = msg.get('content', '')
-            msg_id = msg.get('id', '')
-            msg_timestamp = msg.get('timestamp', '')
-            msg_project = msg.get('project', '')
-            msg_extra = msg.get('extra', '')
-            
-            # Build the context line
-            context_line = f"ID: {msg_id}, Timestamp: {msg_timestamp}, Project: {msg_project}, Extra: {msg_extra}, Text: {msg_content}"
-            
-            # Add image descriptions if present and enabled
-            if include_image_descriptions and 'images' in msg and msg['images']:
-                for i, img in enumerate(msg['images']):
-                    if img.get('description'):
-                        context_line += f"\n[Image {i+1} Description: {img['description']}]"
-            
-            context_string += context_line + "\n\n"
+        # Format the locally retrieved candidates into a context string for the model
+        context_string = self._get_context_string(project, "chat", self._retrieve_context_messages(prompt, project, messages_data))
         
         # Call the model handler with our prepared context
         response, new_history = model_handler.select_messages(
@@ -678,7 +1058,8 @@ class Api:
             project=project,
             use_history=False,
             history=chat_history,
-            context_string=context_string  # Pass the prepared context string with image descriptions
+            context_string=context_string,  # Pass the prepared context string with image descriptions
+            context_id=self._get_context_key(project)
         )
         
         # Create a more detailed response from the Gemini model response
@@ -715,29 +1096,10 @@ class Api:
         try:
             context_messages_str = messages
             if not messages or messages == "":
-                print("[model_assign_projects] WARNING: Message fetching bypasses new cache logic. Fetches all from primary DB.")
+                print("[model_assign_projects] No messages passed, using the cached main chat context.")
                 
-                # Get messages with cache to ensure image data is included
-                messages_data = self._get_messages_with_cache()
-                include_image_descriptions = self.settings.get("include_image_descriptions", DEFAULT_SETTINGS["include_image_descriptions"])
-                
-                # Build context with image descriptions
-                context_lines = []
-                for msg in messages_data:
-                    # Basic message info
-                    msg_line = f"ID: {msg['id']}, Content: {msg['content']}, Project: {msg['project']}"
-                    if msg.get('extra'):
-                        msg_line += f", Context: {msg['extra']}"
-                    
-                    # Add image descriptions if present and enabled
-                    if include_image_descriptions and 'images' in msg and msg['images']:
-                        for i, img in enumerate(msg['images']):
-                            if img.get('description'):
-                                msg_line += f"\n[Image {i+1} Description: {img['description']}]"
-                    
-                    context_lines.append(msg_line)
-                
-                context_messages_str = "\n".join(context_lines)
+                # Cached context string, image descriptions included when enabled
+                context_messages_str = self._get_context_string(None, "assign")
 
             print("model assign projects requested")
             print("project:", projects)
@@ -764,29 +1126,10 @@ class Api:
         try:
             context_messages_str = messages
             if not messages or messages == "":
-                print("[model_create_projects] WARNING: Message fetching bypasses new cache logic. Fetches all from primary DB.")
-                
-                # Get messages with cache to ensure image data is included
-                messages_data = self._get_messages_with_cache()
-                include_image_descriptions = self.settings.get("include_image_descriptions", DEFAULT_SETTINGS["include_image_descriptions"])
-                
-                # Build context with image descriptions
-                context_lines = []
-                for msg in messages_data:
-                    # Basic message info
-                    msg_line = f"ID: {msg['id']}, Content: {msg['content']}, Project: {msg['project']}"
-                    if msg.get('extra'):
-                        msg_line += f", Context: {msg['extra']}"
-                    
-                    # Add image descriptions if present and enabled
-                    if include_image_descriptions and 'images' in msg and msg['images']:
-                        for i, img in enumerate(msg['images']):
-                            if img.get('description'):
-                                msg_line += f"\n[Image {i+1} Description: {img['description']}]"
-                    
-                    context_lines.append(msg_line)
+                print("[model_create_projects] No messages passed, using the cached main chat context.")
                 
-                context_messages_str = "\n".join(context_lines)
+                # Cached context string, image descriptions included when enabled
+                context_messages_str = self._get_context_string(None, "assign")
 
             print("model create projects requested")
             print("messages:", messages)
@@ -840,117 +1183,118 @@ class Api:
         return {'success': True}
 
     def process_all_messages(self):
+        """
+        Starts processing all unprocessed messages as a background job and returns its job_id
+        right away; poll get_job_status for progress. If a run is already going, its job_id
+        is returned instead of starting another one.
+        """
         # TODO: Review if model_handler.process_all_main_chat_messages needs context of clipboard filter
         # Its internal logic fetches "unprocessed messages in the main chat". This needs clarification.
         try:
+            job, created = self._jobs.submit_unique("process_all_messages", self._run_process_all_messages,
+                                                    check_for_new_projects=self._check_projects)
+            if not created:
+                return {'success': True, 'job_id': job.id, 'already_running': True}
             print(f"[process_all_messages] (check_projects={self._check_projects}) - Current clipboard filter: {self._show_clips_in_main_chat}")
             print("[process_all_messages] WARNING: model_handler.process_all_main_chat_messages may need review for clipboard message handling.")
-            model_handler.process_all_main_chat_messages(check_for_new_projects=self._check_projects)
-            reminder_scheduler.refresh_reminders()  # Refresh reminders after processing
-            return {'success': True}
+            return {'success': True, 'job_id': job.id}
         except Exception as e:
             import traceback
             print('process_all_messages error:', e)
             print(traceback.format_exc())
             return {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
 
+    def _run_process_all_messages(self, check_for_new_projects, job):
+        try:
+            return model_handler.process_all_main_chat_messages(check_for_new_projects=check_for_new_projects, job=job)
+        finally:
+            # Also after a cancelled or failed run, the batches already done changed messages
+            self._evict_stale_message_cache()
+            reminder_scheduler.refresh_reminders()  # Refresh reminders after processing
+
+    def get_job_status(self, job_id, with_batches=True):
+        """Status, progress (%) and per-batch status of a background job."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {'success': False, 'error': f"Unknown job {job_id}"}
+        return {'success': True, **job.to_dict(with_batches=with_batches)}
+
+    def get_job_result(self, job_id):
+        """Result of a finished background job (`done` is False while it is still running)."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {'success': False, 'error': f"Unknown job {job_id}"}
+        if not job.finished:
+            return {'success': True, 'done': False, 'status': job.status, 'progress': job.progress}
+        return {'success': job.status != "failed", 'done': True, 'status': job.status,
+                'result': job.result, 'error': job.error}
+
+    def cancel_job(self, job_id):
+        """Asks a background job to stop; it stops after the batch in progress."""
+        if not self._jobs.cancel(job_id):
+            return {'success': False, 'error': f"Unknown job {job_id}"}
+        return {'success': True}
+
+    def list_jobs(self):
+        return {'success': True, 'jobs': [job.to_dict(with_batches=False) for job in self._jobs.list()]}
+
     def process_unprocessed_images(self, max_images_per_batch=25):
         """
-        Process unprocessed images by feeding them to Gemini for description generation.
-        
-        Args:
-            max_images_per_batch (int): Maximum number of images to process in a single batch
-            
-        Returns:
-            dict: Result of the operation including success status, number of images processed
+        Asks the background image worker to describe the images without a description now and
+        returns right away with the number queued. If the worker is disabled (image_worker_enabled),
+        this is a one-shot pass over the current images; it doesn't re-enable the worker.
+        `max_images_per_batch` is kept for compatibility; batch sizes come from the
+        image_worker_* settings.
         """
+        db_handler = None
         try:
             db_handler = db_messages.MessageDatabaseHandler()
-            
-            # First, get all images that don't have descriptions
-            self.cursor = db_handler.conn.cursor()
-            self.cursor.execute("""
-                SELECT mi.id, mi.message_id, mi.file_path, m.content 
-                FROM message_images mi
-                JOIN messages m ON mi.message_id = m.id
-                WHERE mi.description IS NULL OR mi.description = ''
-                LIMIT ?
-            """, (max_images_per_batch,))
-            
-            unprocessed_images = self.cursor.fetchall()
-            
-            if not unprocessed_images:
+            queued = db_handler.count_undescribed_images()
+            if not queued:
                 return {
                     'success': True,
                     'processed': 0,
+                    'queued': 0,
                     'message': 'No unprocessed images found'
                 }
-            
-            # Prepare the API request for Gemini
-            image_data = []
-            for img_id, msg_id, file_path, msg_content in unprocessed_images:
-                full_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)), 
-                    "web", 
-                    file_path if not file_path.startswith('/') else file_path[1:]
-                )
-                
-                if os.path.exists(full_path):
-                    image_data.append({
-                        'img_id': img_id,
-                        'msg_id': msg_id,
-                        'file_path': full_path,
-                        'context': msg_content
-                    })
-                else:
-                    print(f"Warning: Image file not found: {full_path}")
-            
-            if not image_data:
-                return {
-                    'success': False,
-                    'processed': 0,
-                    'message': 'No valid image files found among unprocessed images'
-                }
-            
-            # Process the images with Gemini
-            descriptions = self._process_images_with_gemini(image_data)
-            if not descriptions:
+            if not self._image_worker.drain_once():
                 return {
-                    'success': False,
+                    'success': True,
                     'processed': 0,
-                    'message': 'Failed to get descriptions from Gemini'
+                    'queued': queued,
+                    'message': f'Already describing images, {queued} left'
                 }
-            
-            # Update the database with descriptions
-            processed_count = 0
-            for img_id, description in descriptions.items():
-                db_handler.cursor.execute(
-                    "UPDATE message_images SET description = ? WHERE id = ?",
-                    (description, img_id)
-                )
-                processed_count += 1
-            
-            db_handler.conn.commit()
-            
-            # Clear cache to reflect the updated descriptions
-            self._message_cache.clear()
-            
             return {
                 'success': True,
-                'processed': processed_count,
-                'total': len(unprocessed_images),
-                'message': f'Successfully processed {processed_count} images'
+                'processed': 0,
+                'queued': queued,
+                'message': f'Describing {queued} images in the background'
             }
-        
         except Exception as e:
             import traceback
             print(f"[Error] process_unprocessed_images failed: {e}")
             print(traceback.format_exc())
             return {'success': False, 'error': str(e)}
         finally:
-            if 'db_handler' in locals():
+            if db_handler:
                 db_handler.close()
 
+    def get_image_worker_stats(self):
+        """Queue depth, in-flight images, totals and throughput (images/minute) of the image worker."""
+        try:
+            return {'success': True, 'stats': self._image_worker.get_stats()}
+        except Exception as e:
+            print(f"[Error] get_image_worker_stats failed: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def _image_disk_path(self, file_path):
+        """Maps a stored (web-relative) image path to the file on disk."""
+        return os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "web",
+            file_path if not file_path.startswith('/') else file_path[1:]
+        )
+
     def _process_images_with_gemini(self, image_data):
         """
         Process images with Gemini to get descriptions.
@@ -1004,9 +1348,11 @@ Do not include any extra text, explanations, or markdown formatting outside the
             # Add image parts to the message
             user_parts = []
             for idx, img in enumerate(image_data):
-                # Add context if available
+                # Label every image with its ID (the response refers to it), add context if available
                 if img.get('context'):
                     user_parts.append({"text": f"Image {idx+1} (ID: {img['img_id']}) context: {img['context']}"})
+                else:
+                    user_parts.append({"text": f"Image {idx+1} (ID: {img['img_id']})"})
                 
                 # Read and encode image
                 with open(img['file_path'], 'rb') as image_file:
@@ -1027,9 +1373,12 @@ Do not include any extra text, explanations, or markdown formatting outside the
             })
             
             # Call Gemini with the multipart message
-            response = model_handler.gemini_client.models.generate_content(
-                model="gemini-2.5-flash-preview-04-17",
-                contents=contents
+            response = model_handler.scheduler.call(
+                lambda: model_handler.gemini_client.models.generate_content(
+                    model="gemini-2.5-flash-preview-04-17",
+                    contents=contents
+                ),
+                tokens=258 * len(image_data) + model_handler._count_tokens(system_prompt)  # Gemini bills ~258 tokens per image
             )
             
             # Process the response
@@ -1203,37 +1552,74 @@ Do not include any extra text, explanations, or markdown formatting outside the
             # A more advanced implementation might signal the monitor to update its config.
             if key == "clipboard_save_count":
                 print(f"Setting '{key}' updated to {value}. Restart clipboard monitor or app for changes to take full effect if already running.")
+            if key.startswith("model_"):
+                self._apply_model_settings()
+            if key.startswith("chat_history_"):
+                self._apply_chat_history_settings()
+            if key.startswith("image_worker_"):
+                self._apply_image_worker_settings()
             
             return {"success": True, "message": f"Setting '{key}' updated to {value}."}
         else:
             return {"success": False, "error": f"Setting key '{key}' not found."}
 
+    def _apply_model_settings(self):
+        """Pushes the model-related settings to the shared ModelClient."""
+        model_handler.response_cache_enabled = bool(self.settings.get("model_response_cache", DEFAULT_SETTINGS["model_response_cache"]))
+        ttl_hours = float(self.settings.get("model_response_cache_ttl_hours", DEFAULT_SETTINGS["model_response_cache_ttl_hours"]))
+        model_handler.response_cache_ttl_seconds = int(ttl_hours * 3600)
+
+    def _apply_chat_history_settings(self):
+        """Pushes the chat_history_* settings to the model chat history store (applied on its next update)."""
+        self._chat_history.token_budget = int(self.settings.get("chat_history_token_budget", DEFAULT_SETTINGS["chat_history_token_budget"]))
+        self._chat_history.max_contexts = int(self.settings.get("chat_history_max_contexts", DEFAULT_SETTINGS["chat_history_max_contexts"]))
+
+    def _apply_image_worker_settings(self):
+        """Pushes the image_worker_* settings to the image worker and starts or stops it per image_worker_enabled."""
+        worker = self._image_worker
+        worker.max_concurrency = int(self.settings.get("image_worker_concurrency", DEFAULT_SETTINGS["image_worker_concurrency"]))
+        worker.max_batch_images = int(self.settings.get("image_worker_batch_images", DEFAULT_SETTINGS["image_worker_batch_images"]))
+        worker.max_batch_bytes = int(float(self.settings.get("image_worker_batch_mb", DEFAULT_SETTINGS["image_worker_batch_mb"])) * 1024 * 1024)
+        if self.settings.get("image_worker_enabled", DEFAULT_SETTINGS["image_worker_enabled"]):
+            worker.start()
+        elif worker.running:
+            worker.stop()
+            print("[ImageWorker] Stopped (image_worker_enabled is off).")
+
+    def get_model_cache_stats(self):
+        """Returns hit/miss counters and size of the model response cache."""
+        try:
+            return {'success': True, 'stats': model_handler.get_cache_stats()}
+        except Exception as e:
+            print(f"[Error] get_model_cache_stats failed: {e}")
+            return {'success': False, 'error': str(e)}
+
+    def clear_model_cache(self):
+        """Deletes every stored model response."""
+        try:
+            removed = model_handler.clear_response_cache()
+            return {'success': True, 'removed': removed}
+        except Exception as e:
+            print(f"[Error] clear_model_cache failed: {e}")
+            return {'success': False, 'error': str(e)}
+
     def get_image_descriptions(self):
         """Returns a list of all processed image descriptions for display/debugging purposes."""
         try:
             db_handler = db_messages.MessageDatabaseHandler()
-            self.cursor = db_handler.conn.cursor()
-            
-            # Query all images with descriptions
-            self.cursor.execute("""
-                SELECT mi.id, mi.message_id, mi.file_path, mi.description, m.content
-                FROM message_images mi
-                JOIN messages m ON mi.message_id = m.id
-                WHERE mi.description IS NOT NULL AND mi.description != ''
-                ORDER BY m.timestamp DESC
-            """)
             
             images_with_descriptions = []
-            for img_id, msg_id, file_path, description, msg_content in self.cursor.fetchall():
+            for image in db_handler.get_described_images():
                 # Take only first 100 characters of message content for context
+                msg_content = image['content']
                 short_content = (msg_content[:100] + '...') if len(msg_content) > 100 else msg_content
                 
                 images_with_descriptions.append({
-                    "img_id": img_id,
-                    "msg_id": msg_id,
-                    "file_path": file_path,
+                    "img_id": image['id'],
+                    "msg_id": image['message_id'],
+                    "file_path": image['file_path'],
                     "short_content": short_content,
-                    "description": description
+                    "description": image['description']
                 })
             
             return {
@@ -1263,7 +1649,7 @@ Do not include any extra text, explanations, or markdown formatting outside the
                 WHERE description IS NOT NULL AND description != ''
             """)
             
-            updates = 0
+            cleaned_descriptions = {}
             for row in cursor.fetchall():
                 img_id, description = row
                 
@@ -1291,18 +1677,14 @@ Do not include any extra text, explanations, or markdown formatting outside the
                         
                         # Update the database
                         if clean_description:
-                            cursor.execute(
-                                "UPDATE message_images SET description = ? WHERE id = ?",
-                                (clean_description, img_id)
-                            )
-                            updates += 1
+                            cleaned_descriptions[img_id] = clean_description
                             
                     except Exception as e:
                         print(f"Error cleaning description for image ID {img_id}: {e}")
                         continue
             
-            db_handler.conn.commit()
-            return {"success": True, "cleaned": updates}
+            db_handler.update_image_descriptions(cleaned_descriptions)
+            return {"success": True, "cleaned": len(cleaned_descriptions)}
             
         except Exception as e:
             import traceback
@@ -1317,12 +1699,9 @@ Do not include any extra text, explanations, or markdown formatting outside the
         """Clear all image descriptions to allow reprocessing."""
         try:
             db_handler = db_messages.MessageDatabaseHandler()
-            cursor = db_handler.conn.cursor()
             
             # Clear all descriptions
-            cursor.execute("UPDATE message_images SET description = NULL")
-            affected = cursor.rowcount
-            db_handler.conn.commit()
+            affected = db_handler.clear_image_descriptions()
             
             return {"success": True, "cleared": affected}
             
@@ -1347,6 +1726,11 @@ if __name__ == '__main__':
         print("Main window is closing. Initiating clipboard manager shutdown.")
         # shutdown_clipboard_manager() is designed to be callable globally
         shutdown_clipboard_manager() 
+        api._jobs.shutdown()
+        api._image_worker.stop()
+        model_handler.clear_context_caches()
+        DatabaseWriter.stop_all()
+        ConnectionPool.close_all()
         # Note: Depending on how pywebview handles event processing during shutdown,
         # the main thread operations within shutdown_clipboard_manager (like removeStatusItem)
         # should ideally complete before the app fully terminates.
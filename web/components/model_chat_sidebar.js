@@ -219,6 +219,45 @@ export function renderModelChatSidebar(container, context = {}) {
         
         // Auto-scroll to the latest message (bottom)
         messagesDiv.scrollTop = messagesDiv.scrollHeight;
+        return item;
+    }
+
+    // Streams a generic prompt response into a model message as it is generated.
+    // Returns the full response text.
+    async function streamModelChat(prompt) {
+        const api = window.pywebview.api;
+        const start = await api.start_model_chat_stream(prompt, context.project?.name || null, useHistoryToggle.checked, chatHistory.filter(m => m.role !== 'system'));
+        if (!start || !start.success) {
+            throw new Error(start?.error || 'Could not start model chat stream.');
+        }
+        const item = renderMessage('model', '');
+        const historyEntry = chatHistory[chatHistory.length - 1];
+        const contentDiv = item.querySelector('.message-content');
+        contentDiv.innerHTML = '<span style="color:#888;">…</span>';
+        let text = '';
+        let offset = 0;
+        while (true) {
+            const res = await api.poll_model_chat_stream(start.stream_id, offset);
+            if (!res) break;
+            if (res.text) {
+                text += res.text;
+                offset = res.offset;
+                contentDiv.innerHTML = text.replace(/\n/g, '<br>');
+                messagesDiv.scrollTop = messagesDiv.scrollHeight;
+            }
+            if (res.done) {
+                if (res.error) throw new Error(res.error);
+                break;
+            }
+            if (!res.success) throw new Error(res.error || 'Stream lost');
+            await new Promise(resolve => setTimeout(resolve, 100));
+        }
+        if (!text) {
+            text = 'No response received from model.';
+            contentDiv.innerHTML = text;
+        }
+        historyEntry.content = text;
+        return text;
     }
 
     sendBtn.onclick = async () => {
@@ -295,10 +334,14 @@ export function renderModelChatSidebar(container, context = {}) {
                      renderMessage('model', 'No specific messages selected based on your prompt.');
                 }
             } else {
-                // Generic prompt
-                const res = await window.pywebview?.api?.model_chat(prompt, context.project?.name || null, useHistoryToggle.checked, chatHistory.filter(m => m.role !== 'system'));
-                responseContent = res?.response || 'No response received from model.';
-                renderMessage('model', responseContent);
+                // Generic prompt, streamed when the backend supports it
+                if (window.pywebview?.api?.start_model_chat_stream) {
+                    responseContent = await streamModelChat(prompt);
+                } else {
+                    const res = await window.pywebview?.api?.model_chat(prompt, context.project?.name || null, useHistoryToggle.checked, chatHistory.filter(m => m.role !== 'system'));
+                    responseContent = res?.response || 'No response received from model.';
+                    renderMessage('model', responseContent);
+                }
             }
         } catch (e) {
             responseContent = 'Error processing request: ' + (e.message || e);
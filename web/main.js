@@ -223,12 +223,19 @@ window.scrollToMessage = (msgId) => {
     // Try multiple times with increasing delays
     let attempts = 0;
     const maxAttempts = 15; // Increased max attempts
+    let olderPagesExhausted = false;
 
     const retry = () => {
       li = findMessage();
       if (li) {
         console.log('[main.js] Found element on retry:', li);
         highlightAndScroll(li);
+      } else if (!olderPagesExhausted && typeof window.loadOlderMessages === 'function') {
+        // The message may sit in an older page that has not been loaded yet
+        window.loadOlderMessages().then(loaded => {
+          if (!loaded) olderPagesExhausted = true;
+          retry();
+        });
       } else if (attempts < maxAttempts) {
         attempts++;
 
@@ -539,13 +546,31 @@ if (processAllBtnNavbar) {
     if (window.pywebview?.api?.process_all_messages) {
       processAllBtnNavbar.disabled = true;
       processAllBtnNavbar.textContent = 'Processing...';
-      window.pywebview.api.process_all_messages().then(() => {
-        processAllBtnNavbar.textContent = 'Process Messages';
-        processAllBtnNavbar.disabled = false;
-      }).catch(() => {
+      const finish = () => {
         processAllBtnNavbar.textContent = 'Process Messages';
         processAllBtnNavbar.disabled = false;
-      });
+      };
+      window.pywebview.api.process_all_messages().then(start => {
+        if (!start?.success || !start.job_id) {
+          finish();
+          return;
+        }
+        // Runs as a background job: poll its progress until it is finished
+        const poll = () => {
+          window.pywebview.api.get_job_status(start.job_id, false).then(status => {
+            if (!status?.success || ['completed', 'failed', 'cancelled'].includes(status.status)) {
+              if (status?.status === 'failed') {
+                showNotification(`Error: ${status.error || 'Failed to process messages'}`);
+              }
+              finish();
+              return;
+            }
+            processAllBtnNavbar.textContent = `Processing... ${Math.round(status.progress)}%`;
+            setTimeout(poll, 1000);
+          }).catch(finish);
+        };
+        poll();
+      }).catch(finish);
     }
   };
 }
@@ -560,7 +585,8 @@ if (processImagesBtn) {
         processImagesBtn.disabled = false;
         // Show a notification with the result
         if (result.success) {
-          showNotification(`Processed ${result.processed} images`);
+          // Descriptions are generated by the background image worker
+          showNotification(result.queued ? `Describing ${result.queued} images in the background` : 'No unprocessed images found');
         } else {
           showNotification(`Error: ${result.error || 'Failed to process images'}`);
         }
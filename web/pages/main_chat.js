@@ -1,5 +1,10 @@
 import { Message } from './message.js';
 
+// Keyset pagination state for the main chat list (see Api.get_messages_page)
+let mainChatNextCursor = null;
+let mainChatHasMore = false;
+let mainChatLoadingOlder = false;
+
 // Main Chat page, mirroring Tkinter MainChatWindow
 export function renderMainChat(container, api) {
     let selectedImageFiles = []; // Store selected file paths
@@ -65,6 +70,13 @@ export function renderMainChat(container, api) {
     const selectedFilesPreview = container.querySelector('#selectedFilesPreview');
     const inputArea = container.querySelector('.input-area');
     const showClipsCheckbox = container.querySelector('#showClipsFilter'); // Get checkbox
+    const messagesList = container.querySelector('#messagesList');
+
+    // Load the previous page when the user scrolls near the top of the list
+    messagesList.addEventListener('scroll', () => {
+        if (messagesList.scrollTop < 80) loadOlderMessages(api);
+    });
+    window.loadOlderMessages = () => loadOlderMessages(api); // Used by scrollToMessage for messages not loaded yet
 
     // Helper function to handle files from various sources (dialog, drag-drop, paste)
     function handleFiles(files) {
@@ -332,7 +344,16 @@ function loadMessages(api) {
         setTimeout(() => loadMessages(currentApi), 1000);
         return;
     }
-    currentApi.get_all_messages().then(messages => {
+    // Only the most recent page crosses the bridge on first paint; older pages load on scroll
+    const request = typeof currentApi.get_messages_page === 'function'
+        ? currentApi.get_messages_page(null, null).then(page => {
+            mainChatNextCursor = page ? page.next_cursor : null;
+            mainChatHasMore = !!(page && page.has_more);
+            return page ? page.messages : [];
+        })
+        : currentApi.get_all_messages();
+
+    request.then(messages => {
         const ul = document.getElementById('messagesList');
         ul.innerHTML = '';
         if (!messages || !Array.isArray(messages) || messages.length === 0) {
@@ -364,7 +385,41 @@ function loadMessages(api) {
     });
 }
 
+// Prepends the next older page to the main chat list, keeping the visible messages in place.
+// Resolves to true if anything was loaded.
+async function loadOlderMessages(api) {
+    const currentApi = api || window.pywebview?.api;
+    if (mainChatLoadingOlder || !mainChatHasMore || !currentApi || typeof currentApi.get_messages_page !== 'function') {
+        return false;
+    }
+    mainChatLoadingOlder = true;
+    try {
+        const page = await currentApi.get_messages_page(null, mainChatNextCursor);
+        const ul = document.getElementById('messagesList');
+        if (!ul || !page || !Array.isArray(page.messages)) return false;
+
+        mainChatNextCursor = page.next_cursor;
+        mainChatHasMore = !!page.has_more;
+
+        // Page is newest first; insert so the list stays oldest first, newest last
+        const previousHeight = ul.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        [...page.messages].reverse().forEach(msgData => {
+            const msg = new Message(msgData, api);
+            fragment.appendChild(msg.render());
+        });
+        ul.insertBefore(fragment, ul.firstChild);
+        ul.scrollTop += ul.scrollHeight - previousHeight;
+        return page.messages.length > 0;
+    } catch (e) {
+        console.error("Error loading older messages:", e);
+        return false;
+    } finally {
+        mainChatLoadingOlder = false;
+    }
+}
+
 // Make loadMessages available globally
 window.loadMessages = loadMessages;
 
-export const __testonly__ = { sendMessage, loadMessages };
+export const __testonly__ = { sendMessage, loadMessages, loadOlderMessages };
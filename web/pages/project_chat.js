@@ -2,6 +2,11 @@ import { Message } from './message.js';
 import { renderReminderItem } from '../components/reminder_item.js';
 import { createEmojiPicker } from '../components/emoji_picker.js';
 
+// Keyset pagination state for the project message list (see Api.get_messages_page)
+let projectNextCursor = null;
+let projectHasMore = false;
+let projectLoadingOlder = false;
+
 export function renderProjectChat(container, api, project) {
     // --- Special Handling for Reminders Project ---
     if (project.id === '__reminders__') {
@@ -279,6 +284,13 @@ export function renderProjectChat(container, api, project) {
     const backBtn = container.querySelector('#backToProjectsBtn');
     if (backBtn) backBtn.addEventListener('click', () => window.nav.projects());
 
+    // Load the previous page when the user scrolls near the top of the list
+    const projectMessagesList = container.querySelector('#projectMessages');
+    projectMessagesList.addEventListener('scroll', () => {
+        if (projectMessagesList.scrollTop < 80) loadOlderProjectMessages(api, project);
+    });
+    window.loadOlderMessages = () => loadOlderProjectMessages(api, project); // Used by scrollToMessage for messages not loaded yet
+
     loadProjectMessages(api, project);
 
     // Setup project edit functionality with the clean implementation
@@ -609,7 +621,16 @@ function loadProjectMessages(api, project) {
     const loadingDiv = document.getElementById('projectMsgLoading');
     if (loadingDiv) loadingDiv.hidden = false;
 
-    api.get_all_messages(project.name).then(messages => {
+    // Only the most recent page crosses the bridge on first paint; older pages load on scroll
+    const request = typeof api.get_messages_page === 'function'
+        ? api.get_messages_page(project.name, null).then(page => {
+            projectNextCursor = page ? page.next_cursor : null;
+            projectHasMore = !!(page && page.has_more);
+            return page ? page.messages : [];
+        })
+        : api.get_all_messages(project.name);
+
+    request.then(messages => {
         const ul = document.getElementById('projectMessages');
         ul.innerHTML = '';
         if (!messages || !Array.isArray(messages) || messages.length === 0) {
@@ -642,7 +663,40 @@ function loadProjectMessages(api, project) {
     });
 }
 
+// Prepends the next older page to the project list, keeping the visible messages in place.
+// Resolves to true if anything was loaded.
+async function loadOlderProjectMessages(api, project) {
+    if (projectLoadingOlder || !projectHasMore || !api || typeof api.get_messages_page !== 'function') {
+        return false;
+    }
+    projectLoadingOlder = true;
+    try {
+        const page = await api.get_messages_page(project.name, projectNextCursor);
+        const ul = document.getElementById('projectMessages');
+        if (!ul || !page || !Array.isArray(page.messages)) return false;
+
+        projectNextCursor = page.next_cursor;
+        projectHasMore = !!page.has_more;
+
+        // Page is newest first; insert so the list stays oldest first, newest last
+        const previousHeight = ul.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        [...page.messages].reverse().forEach(msgData => {
+            const msg = new Message(msgData, api);
+            fragment.appendChild(msg.render());
+        });
+        ul.insertBefore(fragment, ul.firstChild);
+        ul.scrollTop += ul.scrollHeight - previousHeight;
+        return page.messages.length > 0;
+    } catch (e) {
+        console.error("Error loading older project messages:", e);
+        return false;
+    } finally {
+        projectLoadingOlder = false;
+    }
+}
+
 // Make loadProjectMessages available globally
 window.loadProjectMessages = loadProjectMessages;
 
-export const __testonly__ = { sendProjectMessage, loadProjectMessages, loadRemindersList };
+export const __testonly__ = { sendProjectMessage, loadProjectMessages, loadOlderProjectMessages, loadRemindersList };